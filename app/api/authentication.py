@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, status, HTTPException, BackgroundTasks, Request
+from fastapi import APIRouter, Depends, status, HTTPException, Request, Response
 from services.users import UserService
 from sqlalchemy.ext.asyncio import AsyncSession
 from database.db import get_db
@@ -9,16 +9,26 @@ from schemas import (
     ErrorsContent,
     ConfirmationResponse,
     ConfirmationRequest,
+    RefreshTokenRequest,
 )
 from logger.logger import build_logger
 from fastapi.security import OAuth2PasswordRequestForm
-from services.hash import verify_password
-from services.auth import create_access_token
-from services.email import send_email, get_email_from_token
-
-
-logger = build_logger("auth", "DEBUG")
-router = APIRouter(prefix="/auth", tags=["authentication"])
+from services.hash import verify_password_async
+from services.auth import create_access_token, get_token_claims, revoke_access_token
+from services.tokens import TokenClaims, user_claims
+from services.refresh_tokens import RefreshTokenService
+from errors import InvalidTokenError
+from services.email import get_email_from_token
+from services.rate_limit import RateLimit
+from conf.config import settings
+
+
+logger = build_logger("auth")
+router = APIRouter(
+    prefix="/auth",
+    tags=["authentication"],
+    dependencies=[Depends(RateLimit("auth", settings.RATE_LIMIT_AUTH))],
+)
 
 
 @router.post(
@@ -29,36 +39,16 @@ router = APIRouter(prefix="/auth", tags=["authentication"])
         409: {"model": ErrorsContent},
         422: {"model": ErrorsContent},
         500: {"model": ErrorsContent},
+        503: {"model": ErrorsContent},
     },
 )
 async def register_user(
-    background_tasks: BackgroundTasks,
     user_data: UserCreate,
     request: Request,
     db: AsyncSession = Depends(get_db),
 ):
     user_service = UserService(logger, db)
-
-    email_user = await user_service.get_user_by_email(user_data.email)
-    if email_user:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="User with such email already exists",
-        )
-
-    username_user = await user_service.get_user_by_username(user_data.username)
-    if username_user:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="User with such username already exists",
-        )
-
-    new_user = await user_service.create_user(user_data)
-
-    send_email(
-        background_tasks, logger, new_user.email, new_user.username, request.base_url
-    )
-    return new_user
+    return await user_service.create_user(user_data, request.base_url)
 
 
 @router.post(
@@ -68,6 +58,7 @@ async def register_user(
         401: {"model": ErrorsContent},
         422: {"model": ErrorsContent},
         500: {"model": ErrorsContent},
+        503: {"model": ErrorsContent},
     },
 )
 async def login_user(
@@ -75,7 +66,14 @@ async def login_user(
 ):
     user_service = UserService(logger, db)
     user = await user_service.get_user_entity_by_username(form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if user is not None:
+        # a rollback would expire the loaded user, which is still needed below
+        db.expunge(user)
+    # end the read so no pooled connection is held while bcrypt runs
+    await db.rollback()
+    if not user or not await verify_password_async(
+        form_data.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect user or password",
@@ -86,7 +84,57 @@ async def login_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email is not confirmed",
         )
-    return TokenModel(access_token=create_access_token(data={"sub": user.username}))
+    user = UserModel.model_validate(user)
+    return TokenModel(
+        access_token=create_access_token(data=user_claims(user)),
+        refresh_token=await RefreshTokenService(logger, db).issue(user),
+    )
+
+
+@router.post(
+    "/refresh",
+    response_model=TokenModel,
+    responses={
+        401: {"model": ErrorsContent},
+        422: {"model": ErrorsContent},
+        500: {"model": ErrorsContent},
+    },
+)
+async def refresh_token(
+    body: RefreshTokenRequest, db: AsyncSession = Depends(get_db)
+):
+    # the refresh token replaces the password, so no bcrypt round here
+    try:
+        user, token = await RefreshTokenService(logger, db).rotate(body.refresh_token)
+    except InvalidTokenError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return TokenModel(
+        access_token=create_access_token(data=user_claims(user)), refresh_token=token
+    )
+
+
+@router.post(
+    "/logout",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={
+        401: {"model": ErrorsContent},
+        422: {"model": ErrorsContent},
+        500: {"model": ErrorsContent},
+    },
+)
+async def logout_user(
+    body: RefreshTokenRequest | None = None,
+    claims: TokenClaims = Depends(get_token_claims),
+    db: AsyncSession = Depends(get_db),
+):
+    await revoke_access_token(claims)
+    if body is not None:
+        await RefreshTokenService(logger, db).revoke(body.refresh_token)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.get(
@@ -125,7 +173,6 @@ async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
 )
 async def request_email(
     body: ConfirmationRequest,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: AsyncSession = Depends(get_db),
 ):
@@ -142,7 +189,5 @@ async def request_email(
             message=f"The email {body.email} is already confirmed"
         )
     if user:
-        send_email(
-            background_tasks, logger, user.email, user.username, request.base_url
-        )
+        await user_service.send_confirmation_email(user, request.base_url)
     return ConfirmationResponse(message=f"Please check your email for confirmation")
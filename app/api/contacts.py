@@ -1,26 +1,67 @@
-from typing import List
+from typing import List, Literal
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from schemas import ContractModel, ContactsQuery, ContactBase
-from database.db import get_db
+from schemas import (
+    ContractModel,
+    ContactsQuery,
+    ContactBase,
+    ContactPatch,
+    ContactsSort,
+    ContactsSearch,
+    ContactsImportResult,
+    ContactsBatchUpdate,
+    ContactsBatchDelete,
+    ContactsBatchResult,
+    ContactsStats,
+    ContactRow,
+    contact_rows_adapter,
+)
+from database.db import get_db, get_read_db, sessionmanager
 from services.contacts import ContactService
 from logger.logger import build_logger
 from fastapi import Path, Query
 from schemas import ErrorsContent, UserModel
 import datetime
-from services.auth import get_current_user
+from services.auth import get_current_user, get_current_user_claims
+from services.rate_limit import RateLimit
+from conf.config import settings
+from pagination import encode_cursor
+from etag import make_etag, is_not_modified, not_modified, set_etag
+from services.contacts_io import IMPORT_PARSERS, parse_contacts
+
+logger = build_logger("contacts_app")
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
 
-logger = build_logger("contacts_app", "DEBUG")
-router = APIRouter(prefix="/contacts", tags=["contacts"])
+
+router = APIRouter(
+    prefix="/contacts",
+    tags=["contacts"],
+    dependencies=[Depends(RateLimit("contacts", settings.RATE_LIMIT_CONTACTS))],
+)
+
+
+def contacts_response(contacts: List[ContactRow]) -> Response:
+    # rows come straight from the database, so they are serialized without
+    # being validated again against response_model
+    return Response(
+        content=contact_rows_adapter.dump_json(contacts),
+        media_type="application/json",
+    )
 
 
 @router.get(
     "/",
     response_model=List[ContractModel],
-    responses={422: {"model": ErrorsContent}, 500: {"model": ErrorsContent}},
+    responses={
+        304: {"description": "Not modified since the ETag in If-None-Match"},
+        422: {"model": ErrorsContent},
+        500: {"model": ErrorsContent},
+    },
 )
 async def read_contacts(
+    request: Request,
     skip: int = Query(
         default=0,
         description="The number of records to skip before starting to return results",
@@ -28,23 +69,56 @@ async def read_contacts(
     limit: int = Query(
         default=10, le=100, ge=10, description="Number of records per response"
     ),
+    cursor: str | None = Query(
+        default=None,
+        description="Opaque cursor from the X-Next-Cursor header of the previous page, takes precedence over skip",
+    ),
+    sort: ContactsSort = Query(default="id", description="Sort order of records"),
     first_name: str | None = Query(default=None, description="Contact first name"),
     last_name: str | None = Query(default=None, description="Contact last name"),
     email: str | None = Query(default=None, description="Contact email"),
-    db: AsyncSession = Depends(get_db),
-    current_user: UserModel = Depends(get_current_user),
+    q: str | None = Query(
+        default=None,
+        min_length=1,
+        max_length=100,
+        description="Search text matched against first name, last name and email",
+    ),
+    search: ContactsSearch = Query(
+        default="prefix", description="How q is matched: by prefix or fuzzy"
+    ),
+    include_total: bool = Query(
+        default=False,
+        description="Return the number of matching contacts in the X-Total-Count header",
+    ),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserModel = Depends(get_current_user_claims),
 ):
     query = ContactsQuery(
         skip=skip,
         limit=limit,
+        cursor=cursor,
+        sort=sort,
         first_name=first_name,
         last_name=last_name,
         email=email,
+        q=q,
+        search=search,
         user_id=current_user.id,
     )
     service = ContactService(logger=logger, db=db)
-    contacts = await service.get_by_query(query)
-    return contacts
+    data_version = await service.get_data_version(current_user)
+    etag = make_etag(data_version, query.model_dump_json(), include_total)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    contacts = await service.get_by_query(query, data_version)
+    response = contacts_response(contacts)
+    if len(contacts) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(sort, contacts[-1])
+    if include_total:
+        total = await service.count_by_query(query, data_version)
+        response.headers["X-Total-Count"] = str(total)
+    set_etag(response, etag)
+    return response
 
 
 @router.post(
@@ -63,6 +137,104 @@ async def create_contacts(
     return contact
 
 
+@router.post(
+    "/bulk",
+    response_model=ContactsImportResult,
+    responses={
+        415: {"model": ErrorsContent},
+        422: {"model": ErrorsContent},
+        500: {"model": ErrorsContent},
+    },
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                content_type: {"schema": {"type": "string"}}
+                for content_type in IMPORT_PARSERS
+            },
+        }
+    },
+)
+async def import_contacts(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user),
+):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type.lower() not in IMPORT_PARSERS:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported content type '{content_type}', expected one of: {', '.join(IMPORT_PARSERS)}",
+        )
+    service = ContactService(logger=logger, db=db)
+    created = await service.import_contacts(
+        parse_contacts(content_type.lower(), request.stream()), current_user
+    )
+    return ContactsImportResult(created=created)
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={422: {"model": ErrorsContent}, 500: {"model": ErrorsContent}},
+)
+async def export_contacts(
+    format: Literal["ndjson", "csv"] = Query(
+        default="ndjson", description="Export format"
+    ),
+    current_user: UserModel = Depends(get_current_user_claims),
+):
+    async def content():
+        # the request scoped session is closed before the body is streamed
+        async with sessionmanager.session(read_only=True) as db:
+            service = ContactService(logger=logger, db=db)
+            async for chunk in service.export_contacts(current_user, format):
+                yield chunk
+
+    return StreamingResponse(
+        content(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="contacts.{format}"'},
+    )
+
+
+@router.patch(
+    "/batch",
+    response_model=ContactsBatchResult,
+    responses={
+        404: {"model": ErrorsContent},
+        422: {"model": ErrorsContent},
+        500: {"model": ErrorsContent},
+    },
+)
+async def update_contacts_batch(
+    request: ContactsBatchUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user),
+):
+    service = ContactService(logger=logger, db=db)
+    return await service.update_many(request, current_user)
+
+
+@router.delete(
+    "/batch",
+    response_model=ContactsBatchResult,
+    responses={
+        404: {"model": ErrorsContent},
+        422: {"model": ErrorsContent},
+        500: {"model": ErrorsContent},
+    },
+)
+async def delete_contacts_batch(
+    request: ContactsBatchDelete,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user),
+):
+    service = ContactService(logger=logger, db=db)
+    return await service.remove_many(request, current_user)
+
+
 @router.put(
     "/{contact_id}",
     response_model=ContractModel,
@@ -84,6 +256,26 @@ async def update_contacts(
     return contact
 
 
+@router.patch(
+    "/{contact_id}",
+    response_model=ContractModel,
+    responses={
+        404: {"model": ErrorsContent},
+        422: {"model": ErrorsContent},
+        500: {"model": ErrorsContent},
+    },
+)
+async def patch_contacts(
+    request: ContactPatch,
+    contact_id: int = Path(description="Contact id"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user),
+):
+    service = ContactService(logger=logger, db=db)
+    contact = await service.patch(contact_id, request, current_user)
+    return contact
+
+
 @router.delete(
     "/{contact_id}",
     response_model=ContractModel,
@@ -106,9 +298,14 @@ async def delete_contacts(
 @router.get(
     "/birthdays",
     response_model=List[ContractModel],
-    responses={422: {"model": ErrorsContent}, 500: {"model": ErrorsContent}},
+    responses={
+        304: {"description": "Not modified since the ETag in If-None-Match"},
+        422: {"model": ErrorsContent},
+        500: {"model": ErrorsContent},
+    },
 )
 async def read_contacts_with_birthdays_in_7_days(
+    request: Request,
     skip: int = Query(
         default=0,
         description="The number of records to skip before starting to return results",
@@ -116,16 +313,49 @@ async def read_contacts_with_birthdays_in_7_days(
     limit: int = Query(
         default=10, le=100, ge=10, description="Number of records per response"
     ),
-    db: AsyncSession = Depends(get_db),
-    current_user: UserModel = Depends(get_current_user),
+    days: int = Query(
+        default=7, ge=0, le=365, description="Number of upcoming days to look ahead"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserModel = Depends(get_current_user_claims),
 ):
     query = ContactsQuery(
         skip=skip,
         limit=limit,
-        date_from=datetime.date.today(),
-        date_to=datetime.date.today() + datetime.timedelta(days=7),
+        birthdays_from=datetime.date.today(),
+        birthdays_days=days,
         user_id=current_user.id,
     )
     service = ContactService(logger=logger, db=db)
-    contacts = await service.get_by_query(query)
-    return contacts
+    data_version = await service.get_data_version(current_user)
+    etag = make_etag(data_version, query.model_dump_json())
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    contacts = await service.get_by_query(query, data_version)
+    response = contacts_response(contacts)
+    set_etag(response, etag)
+    return response
+
+
+@router.get(
+    "/stats",
+    response_model=ContactsStats,
+    responses={
+        304: {"description": "Not modified since the ETag in If-None-Match"},
+        500: {"model": ErrorsContent},
+    },
+)
+async def read_contacts_stats(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserModel = Depends(get_current_user_claims),
+):
+    service = ContactService(logger=logger, db=db)
+    data_version = await service.get_data_version(current_user)
+    etag = make_etag(current_user.id, data_version, "stats")
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    stats = await service.get_stats(current_user, data_version)
+    set_etag(response, etag)
+    return stats
@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+
+from metrics.collectors import render_latest
+
+router = APIRouter(tags=["system"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    content, media_type = render_latest()
+    return Response(content=content, media_type=media_type)
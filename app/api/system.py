@@ -0,0 +1,25 @@
+from typing import List
+
+from fastapi import APIRouter, Depends
+
+from cache.contacts import contact_query_cache
+from database.db import sessionmanager
+from schemas import CacheStatus, ErrorsContent, PoolStatus
+from services.auth import get_admin_user
+
+router = APIRouter(
+    prefix="/system",
+    tags=["system"],
+    dependencies=[Depends(get_admin_user)],
+    responses={401: {"model": ErrorsContent}, 403: {"model": ErrorsContent}},
+)
+
+
+@router.get("/db-pool", response_model=List[PoolStatus])
+async def read_db_pool_status():
+    return sessionmanager.pool_status()
+
+
+@router.get("/cache", response_model=List[CacheStatus])
+async def read_cache_status():
+    return [contact_query_cache.status()]
@@ -1,33 +1,43 @@
-from fastapi import APIRouter, Depends, Request, UploadFile, File
+from fastapi import APIRouter, Depends, Request, Response, UploadFile, File
 from schemas import UserModel, ErrorsContent
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from services.auth import get_current_user
 from database.db import get_db
 from sqlalchemy.ext.asyncio import AsyncSession
 from conf.config import settings
 from services.users import UserService
 from logger.logger import build_logger
-from services.upload_file import UploadFileService
+from services.upload_file import UploadFileService, get_avatar_storage
+from services.rate_limit import RateLimit
+from etag import make_etag, is_not_modified, not_modified, set_etag
 
-router = APIRouter(prefix="/users", tags=["users"])
-limiter = Limiter(key_func=get_remote_address)
-logger = build_logger("users", "DEBUG")
+router = APIRouter(
+    prefix="/users",
+    tags=["users"],
+    dependencies=[Depends(RateLimit("users", settings.RATE_LIMIT_USERS))],
+)
+logger = build_logger("users")
 
 
 @router.get(
     "/me",
     response_model=UserModel,
     responses={
+        304: {"description": "Not modified since the ETag in If-None-Match"},
         401: {"model": ErrorsContent},
         429: {"model": ErrorsContent},
         500: {"model": ErrorsContent},
     },
 )
-@limiter.limit("5/minute")
 async def login_user(
-    request: Request, current_user: UserModel = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    current_user: UserModel = Depends(get_current_user),
 ):
+    # derived from the (possibly cached) user itself so the tag always matches the body
+    etag = make_etag(current_user.model_dump_json())
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     return current_user
 
 
@@ -36,6 +46,8 @@ async def login_user(
     response_model=UserModel,
     responses={
         401: {"model": ErrorsContent},
+        413: {"model": ErrorsContent},
+        422: {"model": ErrorsContent},
         429: {"model": ErrorsContent},
         500: {"model": ErrorsContent},
     },
@@ -45,10 +57,8 @@ async def update_avatar_user(
     current_user: UserModel = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    avatar_url = UploadFileService(
-        settings.CLOUDINARY_NAME,
-        settings.CLOUDINARY_API_KEY,
-        settings.CLOUDINARY_API_SECRET,
+    avatar_url = await UploadFileService(
+        get_avatar_storage(), settings.AVATAR_MAX_BYTES, settings.AVATAR_SIZE
     ).upload_file(file, current_user.username)
 
     user_service = UserService(logger, db)
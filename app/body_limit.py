@@ -0,0 +1,79 @@
+from fastapi import HTTPException, status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from errors import AvatarTooLargeError
+from schemas import ErrorContent, ErrorsContent
+
+# room for the multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+
+class BodyTooLarge(HTTPException):
+    # an HTTPException passes through FastAPI's body parsing untouched and is
+    # answered by the regular handler
+    def __init__(self, max_bytes: int):
+        super().__init__(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(AvatarTooLargeError(max_bytes - MULTIPART_OVERHEAD_BYTES)),
+        )
+
+
+class BodySizeLimitMiddleware:
+    """Rejects request bodies over the limit of their path before they are parsed.
+
+    A larger Content-Length is refused up front; bodies without one (chunked)
+    are counted while they are received, so nothing past the limit is read.
+    """
+
+    def __init__(self, app: ASGIApp, limits: dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        max_bytes = (
+            self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        )
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit():
+            if int(content_length) > max_bytes:
+                await self.__reject(scope, receive, send, max_bytes)
+                return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    raise BodyTooLarge(max_bytes)
+            return message
+
+        async def tracking_send(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except BodyTooLarge:
+            if response_started:
+                raise
+            await self.__reject(scope, receive, send, max_bytes)
+
+    @staticmethod
+    async def __reject(scope: Scope, receive: Receive, send: Send, max_bytes: int):
+        error = ErrorContent(message=BodyTooLarge(max_bytes).detail)
+        response = JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content=ErrorsContent(errors=[error]).model_dump(),
+            headers={"Connection": "close"},
+        )
+        await response(scope, receive, send)
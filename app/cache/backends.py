@@ -0,0 +1,116 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import cache
+
+
+class CacheBackend(ABC):
+    # True when the stored values are visible to the current process only
+    is_local: bool = False
+
+    @abstractmethod
+    async def get(self, key: str) -> str | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: float | None = None) -> None: ...
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None: ...
+
+    def usage(self) -> tuple[int, int] | None:
+        """(entries, bytes) held by the backend when it can tell cheaply."""
+        return None
+
+
+class MemoryCacheBackend(CacheBackend):
+    is_local = True
+
+    def __init__(self, max_size: int, ttl: float | None = None, max_bytes: int | None = None):
+        self.__max_size = max_size
+        self.__max_bytes = max_bytes
+        self.__ttl = ttl
+        self.__items: OrderedDict[str, tuple[float | None, str, int]] = OrderedDict()
+        self.__bytes = 0
+
+    async def get(self, key: str) -> str | None:
+        item = self.__items.get(key)
+        if item is None:
+            return None
+        expires_at, value, _ = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.__pop(key)
+            return None
+        self.__items.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float | None = None) -> None:
+        ttl = ttl if ttl is not None else self.__ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        size = len(value.encode())
+        if self.__max_bytes is not None and size > self.__max_bytes:
+            return
+        self.__pop(key)
+        self.__items[key] = (expires_at, value, size)
+        self.__bytes += size
+        while len(self.__items) > self.__max_size or (
+            self.__max_bytes is not None and self.__bytes > self.__max_bytes
+        ):
+            self.__pop(next(iter(self.__items)))
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.__pop(key)
+
+    def usage(self) -> tuple[int, int] | None:
+        return len(self.__items), self.__bytes
+
+    def __pop(self, key: str) -> None:
+        item = self.__items.pop(key, None)
+        if item is not None:
+            self.__bytes -= item[2]
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache stored in a Redis-protocol server through a redis.asyncio compatible client."""
+
+    def __init__(self, client, namespace: str, ttl: float | None = None):
+        self.__client = client
+        self.__namespace = namespace
+        self.__ttl = ttl
+
+    async def get(self, key: str) -> str | None:
+        value = await self.__client.get(self.__key(key))
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def set(self, key: str, value: str, ttl: float | None = None) -> None:
+        ttl = ttl if ttl is not None else self.__ttl
+        px = max(int(ttl * 1000), 1) if ttl is not None else None
+        await self.__client.set(self.__key(key), value, px=px)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.__client.delete(*[self.__key(key) for key in keys])
+
+    def __key(self, key: str) -> str:
+        return f"{self.__namespace}:{key}"
+
+
+@cache
+def get_redis_client(url: str):
+    from redis import asyncio as redis
+
+    return redis.from_url(url)
+
+
+def build_cache_backend(
+    url: str,
+    namespace: str,
+    max_size: int,
+    ttl: float | None = None,
+    max_bytes: int | None = None,
+) -> CacheBackend:
+    if url.startswith("memory://"):
+        return MemoryCacheBackend(max_size, ttl, max_bytes)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCacheBackend(get_redis_client(url), namespace, ttl)
+    raise ValueError(f"Unsupported cache url '{url}'")
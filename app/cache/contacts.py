@@ -0,0 +1,93 @@
+import hashlib
+from typing import List
+
+from cache.backends import CacheBackend, build_cache_backend
+from conf.config import settings
+from schemas import (
+    CacheStatus,
+    ContactsQuery,
+    ContactsStats,
+    ContactRow,
+    contact_rows_adapter,
+)
+
+
+class ContactQueryCache:
+    """Contact search results, totals and stats keyed by user, data version and the normalized query.
+
+    Every contact write bumps the user's data version, so entries of older
+    versions are never read again and age out through LRU and TTL eviction.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.__backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get(
+        self, query: ContactsQuery, data_version: int
+    ) -> List[ContactRow] | None:
+        raw = await self.__lookup(self.__key("rows", query, data_version))
+        return contact_rows_adapter.validate_json(raw) if raw is not None else None
+
+    async def set(
+        self, query: ContactsQuery, data_version: int, contacts: List[ContactRow]
+    ) -> None:
+        await self.__backend.set(
+            self.__key("rows", query, data_version),
+            contact_rows_adapter.dump_json(contacts).decode(),
+        )
+
+    async def get_total(self, query: ContactsQuery, data_version: int) -> int | None:
+        raw = await self.__lookup(self.__key("total", query, data_version))
+        return int(raw) if raw is not None else None
+
+    async def set_total(
+        self, query: ContactsQuery, data_version: int, total: int
+    ) -> None:
+        await self.__backend.set(self.__key("total", query, data_version), str(total))
+
+    async def get_stats(self, user_id: int, data_version: int) -> ContactsStats | None:
+        raw = await self.__lookup(f"{user_id}:{data_version}:stats")
+        return ContactsStats.model_validate_json(raw) if raw is not None else None
+
+    async def set_stats(
+        self, user_id: int, data_version: int, stats: ContactsStats
+    ) -> None:
+        await self.__backend.set(
+            f"{user_id}:{data_version}:stats", stats.model_dump_json()
+        )
+
+    async def __lookup(self, key: str) -> str | None:
+        raw = await self.__backend.get(key)
+        if raw is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return raw
+
+    def status(self) -> CacheStatus:
+        entries, size = self.__backend.usage() or (None, None)
+        return CacheStatus(
+            name="contacts",
+            hits=self.hits,
+            misses=self.misses,
+            entries=entries,
+            bytes=size,
+        )
+
+    @staticmethod
+    def __key(kind: str, query: ContactsQuery, data_version: int) -> str:
+        digest = hashlib.sha256(query.model_dump_json().encode()).hexdigest()
+        return f"{query.user_id}:{data_version}:{kind}:{digest}"
+
+
+contact_query_cache = ContactQueryCache(
+    build_cache_backend(
+        settings.CACHE_URL,
+        "contacts",
+        settings.CONTACTS_CACHE_MAX_SIZE,
+        settings.CONTACTS_CACHE_TTL_SECONDS,
+        settings.CONTACTS_CACHE_MAX_BYTES,
+    )
+)
@@ -0,0 +1,90 @@
+import time
+
+
+class FakeRedis:
+    """In-process stand-in for the subset of redis.asyncio.Redis used by the caches, for tests."""
+
+    def __init__(self):
+        self.__items: dict[str, tuple[float | None, bytes]] = {}
+        self.__sorted_sets: dict[str, dict[bytes, float]] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        item = self.__items.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.__items[key]
+            return None
+        return value
+
+    async def set(
+        self, key: str, value, ex: int | None = None, px: int | None = None
+    ) -> bool:
+        expires_at = None
+        if ex is not None:
+            expires_at = time.monotonic() + ex
+        elif px is not None:
+            expires_at = time.monotonic() + px / 1000
+        self.__items[key] = (expires_at, self.__encode(value))
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self.__items.pop(key, None) is not None for key in keys)
+
+    async def zadd(self, key: str, mapping: dict) -> int:
+        members = self.__sorted_sets.setdefault(key, {})
+        added = sum(self.__encode(member) not in members for member in mapping)
+        members.update({self.__encode(member): score for member, score in mapping.items()})
+        return added
+
+    async def zremrangebyscore(self, key: str, low, high) -> int:
+        members = self.__sorted_sets.get(key, {})
+        removed = [m for m, score in members.items() if float(low) <= score <= float(high)]
+        for member in removed:
+            del members[member]
+        return len(removed)
+
+    async def zrangebyscore(self, key: str, low, high, withscores: bool = False):
+        members = sorted(
+            (score, member)
+            for member, score in self.__sorted_sets.get(key, {}).items()
+            if float(low) <= score <= float(high)
+        )
+        if withscores:
+            return [(member, score) for score, member in members]
+        return [member for _, member in members]
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+    @staticmethod
+    def __encode(value) -> bytes:
+        return value.encode() if isinstance(value, str) else value
+
+
+class FakePipeline:
+    """Queues commands and runs them on execute, like a redis.asyncio pipeline."""
+
+    def __init__(self, client: FakeRedis):
+        self.__client = client
+        self.__commands = []
+
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.__commands.clear()
+
+    def __getattr__(self, name: str):
+        command = getattr(self.__client, name)
+
+        def queue(*args, **kwargs) -> "FakePipeline":
+            self.__commands.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self) -> list:
+        commands, self.__commands = self.__commands, []
+        return [await command(*args, **kwargs) for command, args, kwargs in commands]
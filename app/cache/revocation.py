@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import math
+import time
+
+from cache.backends import CacheBackend, build_cache_backend, get_redis_client
+from conf.config import settings
+
+
+class BloomFilter:
+    """Fixed size set membership test without false negatives."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.__size = max(
+            int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8
+        )
+        self.__hashes = max(round(self.__size / capacity * math.log(2)), 1)
+        self.__bits = bytearray((self.__size + 7) // 8)
+
+    def add(self, key: str) -> None:
+        for position in self.__positions(key):
+            self.__bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.__bits[position >> 3] & (1 << (position & 7))
+            for position in self.__positions(key)
+        )
+
+    def __positions(self, key: str):
+        digest = hashlib.sha256(key.encode()).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        return ((h1 + i * h2) % self.__size for i in range(self.__hashes))
+
+
+class RevocationLog:
+    """Time ordered log of revoked ids in a Redis sorted set, read by every worker."""
+
+    def __init__(self, client, key: str, ttl: float):
+        self.__client = client
+        self.__key = key
+        self.__ttl = ttl
+
+    async def append(self, jti: str) -> None:
+        now = time.time()
+        async with self.__client.pipeline(transaction=True) as pipeline:
+            pipeline.zadd(self.__key, {jti: now})
+            pipeline.zremrangebyscore(self.__key, "-inf", now - self.__ttl)
+            await pipeline.execute()
+
+    async def read(self, since: float) -> tuple[list[str], float]:
+        """Ids logged at or after `since`, and the position to read from next time."""
+        entries = await self.__client.zrangebyscore(
+            self.__key, since, "+inf", withscores=True
+        )
+        jtis = [jti.decode() if isinstance(jti, bytes) else jti for jti, _ in entries]
+        return jtis, max((score for _, score in entries), default=since)
+
+
+class TokenRevocationList:
+    """Ids (jti) of revoked access tokens, kept until the tokens would expire anyway.
+
+    With a shared backend every worker keeps a bloom filter of the revoked
+    ids, fed by its own revocations and by reading the shared revocation
+    log at most every `sync_interval` seconds, so only ids in the filter cost
+    a round trip. A token revoked by another worker may thus pass here for up
+    to `sync_interval` seconds. Bloom filters can not forget, so two
+    generations are kept and rotated every `window` seconds (the longest
+    access token lifetime): an entry outlives its token by up to one window.
+
+    Without a log the backend is process local and asked directly, a filter
+    would not be cheaper than its lookup; revocations then reach the current
+    worker only.
+    """
+
+    # re-read this much of the log, entries are stamped by the revoking worker's clock
+    LOG_OVERLAP_SECONDS = 5
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        log: RevocationLog | None,
+        capacity: int,
+        window: float,
+        sync_interval: float,
+    ):
+        self.__backend = backend
+        self.__log = log
+        self.__capacity = capacity
+        self.__window = window
+        self.__sync_interval = sync_interval
+        self.__current = BloomFilter(capacity)
+        self.__previous = BloomFilter(capacity)
+        self.__rotated_at = time.monotonic()
+        self.__synced_at: float | None = None
+        self.__log_position = 0.0
+        self.__syncing = asyncio.Lock()
+
+    async def revoke(self, jti: str, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        await self.__backend.set(jti, "1", ttl)
+        if self.__log is not None:
+            await self.__log.append(jti)
+            self.__rotate()
+            self.__current.add(jti)
+
+    async def is_revoked(self, jti: str) -> bool:
+        if self.__log is not None:
+            self.__rotate()
+            await self.__sync()
+            if jti not in self.__current and jti not in self.__previous:
+                return False
+        return await self.__backend.get(jti) is not None
+
+    async def __sync(self) -> None:
+        if not self.__sync_due():
+            return
+        if self.__syncing.locked() and self.__synced_at is not None:
+            # another request is reading the log, the filter is recent enough
+            return
+        async with self.__syncing:
+            if not self.__sync_due():
+                return
+            jtis, self.__log_position = await self.__log.read(
+                max(self.__log_position - self.LOG_OVERLAP_SECONDS, 0)
+            )
+            for jti in jtis:
+                self.__current.add(jti)
+            self.__synced_at = time.monotonic()
+
+    def __sync_due(self) -> bool:
+        return (
+            self.__synced_at is None
+            or time.monotonic() - self.__synced_at >= self.__sync_interval
+        )
+
+    def __rotate(self) -> None:
+        if time.monotonic() - self.__rotated_at < self.__window:
+            return
+        self.__previous = self.__current
+        self.__current = BloomFilter(self.__capacity)
+        self.__rotated_at = time.monotonic()
+
+
+def build_token_revocations() -> TokenRevocationList:
+    window = settings.JWT_EXPIRATION_SECONDS + settings.JWT_LEEWAY_SECONDS
+    # sized so revoked tokens are not evicted before they expire
+    backend = build_cache_backend(
+        settings.CACHE_URL, "revoked_tokens", settings.TOKEN_REVOCATION_CAPACITY
+    )
+    log = None
+    if not backend.is_local:
+        log = RevocationLog(
+            get_redis_client(settings.CACHE_URL), "revoked_tokens::log", window
+        )
+    return TokenRevocationList(
+        backend,
+        log,
+        settings.TOKEN_REVOCATION_CAPACITY,
+        window,
+        settings.TOKEN_REVOCATION_SYNC_SECONDS,
+    )
+
+
+token_revocations = build_token_revocations()
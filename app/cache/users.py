@@ -0,0 +1,28 @@
+from cache.backends import CacheBackend, build_cache_backend
+from conf.config import settings
+from schemas import UserModel
+
+
+class UserCache:
+    def __init__(self, backend: CacheBackend):
+        self.__backend = backend
+
+    async def get(self, username: str) -> UserModel | None:
+        raw = await self.__backend.get(username)
+        return UserModel.model_validate_json(raw) if raw else None
+
+    async def set(self, user: UserModel) -> None:
+        await self.__backend.set(user.username, user.model_dump_json())
+
+    async def invalidate(self, username: str) -> None:
+        await self.__backend.delete(username)
+
+
+user_cache = UserCache(
+    build_cache_backend(
+        settings.CACHE_URL,
+        "users",
+        settings.USER_CACHE_MAX_SIZE,
+        settings.USER_CACHE_TTL_SECONDS,
+    )
+)
@@ -1,16 +1,58 @@
+import os
+
 from pydantic import ConfigDict
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
+    LOG_LEVEL: str = "INFO"
+    # "json" (one object per line) or "text"
+    LOG_FORMAT: str = "json"
+
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     POSTGRES_HOST: str
     POSTGRES_DB: str
+    # optional hot standby used by read-only endpoints
+    POSTGRES_REPLICA_HOST: str | None = None
+
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # 0 disables the server side statement timeout
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    # asyncpg prepared statement cache, set to 0 behind pgbouncer in transaction mode
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_ECHO: bool = False
+    # total connection budget shared by all server workers, 0 keeps DB_POOL_SIZE per worker
+    DB_MAX_CONNECTIONS: int = 0
+
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    # 0 starts one worker process per CPU
+    SERVER_WORKERS: int = 1
+    SERVER_LOOP: str = "uvloop"
+    SERVER_HTTP: str = "httptools"
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS: int = 30
+    SERVER_KEEP_ALIVE_SECONDS: int = 5
+    # open the pool connections before a worker starts accepting requests
+    SERVER_WARM_UP: bool = True
 
     JWT_SECRET: str = "pryvit"
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_SECONDS: int = 3600
+    REFRESH_TOKEN_EXPIRATION_SECONDS: int = 30 * 24 * 3600
+    # revoked access tokens remembered per access token lifetime
+    TOKEN_REVOCATION_CAPACITY: int = 100000
+    # how often workers pick up revocations of the others from a shared CACHE_URL
+    TOKEN_REVOCATION_SYNC_SECONDS: float = 1.0
+    # "jose" or "pyjwt" (needs the PyJWT package installed)
+    JWT_BACKEND: str = "jose"
+    JWT_LEEWAY_SECONDS: int = 0
+    # decoded access tokens kept per process until they expire
+    TOKEN_CACHE_MAX_SIZE: int = 10000
 
     MAIL_USERNAME: str
     MAIL_PASSWORD: str
@@ -23,17 +65,80 @@ class Settings(BaseSettings):
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
 
+    EMAIL_WORKER_BATCH_SIZE: int = 50
+    EMAIL_WORKER_POLL_SECONDS: float = 1.0
+    EMAIL_MAX_ATTEMPTS: int = 8
+    EMAIL_RETRY_BASE_SECONDS: float = 5
+    EMAIL_RETRY_MAX_SECONDS: float = 3600
+    # how long claimed emails stay with a worker before another may send them
+    EMAIL_SEND_LEASE_SECONDS: float = 300
+    # serves the worker's Prometheus metrics on this port, 0 disables
+    EMAIL_WORKER_METRICS_PORT: int = 0
+
+    # request metrics middleware and the /metrics endpoint
+    METRICS_ENABLED: bool = True
+    # /api/system/* pool and cache internals, for the comma separated usernames only
+    SYSTEM_ENDPOINTS_ENABLED: bool = False
+    SYSTEM_ADMINS: str = ""
+
+    # bcrypt runs in a "thread" or "process" pool, extra calls wait in a bounded queue
+    HASH_POOL_KIND: str = "thread"
+    HASH_POOL_WORKERS: int = 4
+    HASH_POOL_MAX_QUEUE: int = 64
+
+    # rows per INSERT when importing and per fetch when exporting contacts
+    CONTACTS_BULK_BATCH_SIZE: int = 1000
+
+    # memory:// is per process, redis://host:6379/0 shares the limits across workers
+    RATE_LIMIT_STORAGE_URL: str = "memory://"
+    # "moving-window" (sliding) or "fixed-window"
+    RATE_LIMIT_STRATEGY: str = "moving-window"
+    # per router limits in "count/period" form separated by ";", empty disables
+    RATE_LIMIT_AUTH: str = "20/minute"
+    RATE_LIMIT_USERS: str = "5/minute"
+    RATE_LIMIT_CONTACTS: str = "300/minute"
+
     CLOUDINARY_NAME: str
     CLOUDINARY_API_KEY: str
     CLOUDINARY_API_SECRET: str
 
+    # "cloudinary" or "local" (files served from AVATAR_LOCAL_URL)
+    AVATAR_STORAGE: str = "cloudinary"
+    AVATAR_LOCAL_DIR: str = "static/avatars"
+    AVATAR_LOCAL_URL: str = "/static/avatars"
+    AVATAR_MAX_BYTES: int = 5 * 1024 * 1024
+    AVATAR_SIZE: int = 250
+
+    # memory:// keeps caches in process, redis://host:6379/0 shares them
+    CACHE_URL: str = "memory://"
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_SIZE: int = 10000
+    # contact search results, the byte cap applies to memory:// (use maxmemory on redis)
+    CONTACTS_CACHE_TTL_SECONDS: int = 300
+    CONTACTS_CACHE_MAX_SIZE: int = 10000
+    CONTACTS_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
     model_config = ConfigDict(
         extra="ignore", env_file=".env", env_file_encoding="utf-8", case_sensitive=True
     )
 
+    @property
+    def SYSTEM_ADMIN_USERNAMES(self) -> set[str]:
+        return {name.strip() for name in self.SYSTEM_ADMINS.split(",") if name.strip()}
+
+    @property
+    def SERVER_WORKER_COUNT(self) -> int:
+        return self.SERVER_WORKERS or os.cpu_count() or 1
+
     @property
     def DB_URL(self) -> str:
         return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:5432/{self.POSTGRES_DB}"
 
+    @property
+    def DB_REPLICA_URL(self) -> str | None:
+        if not self.POSTGRES_REPLICA_HOST:
+            return None
+        return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_REPLICA_HOST}:5432/{self.POSTGRES_DB}"
+
 
 settings = Settings()
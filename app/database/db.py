@@ -1,26 +1,135 @@
+import asyncio
 import contextlib
+import time
+from typing import Callable
 
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from conf.config import settings
+from schemas import PoolStatus
+
+
+# checkouts slower than this waited for a connection to be returned or opened
+POOL_WAIT_THRESHOLD_SECONDS = 0.001
+
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long callers wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_count = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - started
+            self.checkouts += 1
+            if wait > POOL_WAIT_THRESHOLD_SECONDS:
+                self.wait_count += 1
+                self.wait_seconds_total += wait
+                self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+
+def pool_limits() -> tuple[int, int]:
+    """Return (pool_size, max_overflow) for a single server worker."""
+    if not settings.DB_MAX_CONNECTIONS:
+        return settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+    per_worker = max(settings.DB_MAX_CONNECTIONS // settings.SERVER_WORKER_COUNT, 1)
+    pool_size = min(settings.DB_POOL_SIZE, per_worker)
+    return pool_size, per_worker - pool_size
+
+
+def build_engine(url: str) -> AsyncEngine:
+    connect_args = {"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        connect_args["server_settings"] = {
+            "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)
+        }
+    pool_size, max_overflow = pool_limits()
+    return create_async_engine(
+        url,
+        poolclass=TimedAsyncAdaptedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        echo=settings.DB_ECHO,
+        connect_args=connect_args,
+    )
+
 
 class DatabaseSessionManager:
-    def __init__(self, url: str):
-        self._engine: AsyncEngine | None = create_async_engine(url)
-        self._session_maker: async_sessionmaker = async_sessionmaker(
-            autoflush=False, autocommit=False, bind=self._engine
+    def __init__(self, url: str, replica_url: str | None = None):
+        # engines are built on first use (or by the app lifespan), importing
+        # this module does not load the driver or create pools
+        self.__url = url
+        self.__replica_url = replica_url
+        self.__engine_listeners: list[Callable[[AsyncEngine, str], None]] = []
+        self._engine: AsyncEngine | None = None
+        self._session_maker: async_sessionmaker | None = None
+        self._replica_engine: AsyncEngine | None = None
+        self._replica_session_maker: async_sessionmaker | None = None
+
+    def on_engine_created(self, listener: Callable[[AsyncEngine, str], None]):
+        """Call `listener(engine, name)` for every engine, including already built ones."""
+        if listener in self.__engine_listeners:
+            return
+        self.__engine_listeners.append(listener)
+        for name, engine in self.__named_engines().items():
+            listener(engine, name)
+
+    def init(self):
+        if self._engine is not None:
+            return
+        self._engine = build_engine(self.__url)
+        self._session_maker = self.__session_maker(self._engine)
+        # read-only sessions fall back to the primary when no replica is configured
+        self._replica_engine = (
+            build_engine(self.__replica_url) if self.__replica_url else None
+        )
+        self._replica_session_maker = (
+            self.__session_maker(self._replica_engine)
+            if self._replica_engine
+            else self._session_maker
+        )
+        for name, engine in self.__named_engines().items():
+            for listener in self.__engine_listeners:
+                listener(engine, name)
+
+    @staticmethod
+    def __session_maker(engine: AsyncEngine) -> async_sessionmaker:
+        return async_sessionmaker(
+            autoflush=False,
+            autocommit=False,
+            expire_on_commit=False,
+            bind=engine,
         )
 
     @contextlib.asynccontextmanager
-    async def session(self):
-        if self._session_maker is None:
-            raise Exception("Database session is not initialized")
-        session = self._session_maker()
+    async def session(self, read_only: bool = False):
+        self.init()
+        session_maker = (
+            self._replica_session_maker if read_only else self._session_maker
+        )
+        session = session_maker()
         try:
             yield session
         except SQLAlchemyError as e:
@@ -29,10 +138,70 @@ class DatabaseSessionManager:
         finally:
             await session.close()
 
+    async def warm_up(self):
+        """Fill the pools with ready connections so the first requests do not pay for connecting."""
+        self.init()
+        for engine in self.__engines():
+            connections = await asyncio.gather(
+                *(engine.connect() for _ in range(engine.pool.size())),
+                return_exceptions=True,
+            )
+            opened = [c for c in connections if not isinstance(c, BaseException)]
+            try:
+                for connection in connections:
+                    if isinstance(connection, BaseException):
+                        raise connection
+                await asyncio.gather(
+                    *(connection.execute(text("SELECT 1")) for connection in opened)
+                )
+            finally:
+                for connection in opened:
+                    await connection.close()
+
+    async def close(self):
+        for engine in self.__engines():
+            await engine.dispose()
+        self._engine = self._replica_engine = None
+        self._session_maker = self._replica_session_maker = None
+
+    def __engines(self) -> list[AsyncEngine]:
+        return list(self.__named_engines().values())
+
+    def __named_engines(self) -> dict[str, AsyncEngine]:
+        engines = {"primary": self._engine, "replica": self._replica_engine}
+        return {name: engine for name, engine in engines.items() if engine is not None}
 
-sessionmanager = DatabaseSessionManager(settings.DB_URL)
+    def pool_status(self) -> list[PoolStatus]:
+        return [
+            self.__pool_status(name, engine)
+            for name, engine in self.__named_engines().items()
+        ]
+
+    @staticmethod
+    def __pool_status(name: str, engine: AsyncEngine) -> PoolStatus:
+        pool = engine.pool
+        return PoolStatus(
+            engine=name,
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+            checkouts=pool.checkouts,
+            wait_count=pool.wait_count,
+            wait_seconds_total=pool.wait_seconds_total,
+            wait_seconds_max=pool.wait_seconds_max,
+            timeouts=pool.timeouts,
+        )
+
+
+sessionmanager = DatabaseSessionManager(settings.DB_URL, settings.DB_REPLICA_URL)
 
 
 async def get_db():
     async with sessionmanager.session() as session:
         yield session
+
+
+async def get_read_db():
+    async with sessionmanager.session(read_only=True) as session:
+        yield session
@@ -2,3 +2,40 @@ class ContactNotFoundError(Exception):
     def __init__(self, id):
         super().__init__(f"No contact found by id {id}")
         self.id = id
+
+
+class UserAlreadyExistsError(Exception):
+    def __init__(self, field: str):
+        super().__init__(f"User with such {field} already exists")
+        self.field = field
+
+
+class InvalidTokenError(Exception):
+    pass
+
+
+class ExpiredTokenError(InvalidTokenError):
+    pass
+
+
+class HashPoolSaturatedError(Exception):
+    def __init__(self):
+        super().__init__("Server is busy, please try again later")
+
+
+class AvatarTooLargeError(Exception):
+    def __init__(self, max_bytes):
+        super().__init__(f"Avatar exceeds the maximum size of {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+class InvalidAvatarError(ValueError):
+    def __init__(self):
+        super().__init__("Avatar is not a valid image")
+
+
+class RateLimitExceededError(Exception):
+    def __init__(self, limit: str, reset_at: float):
+        super().__init__(f"Request limit {limit} exceeded. Please try again later.")
+        self.limit = limit
+        self.reset_at = reset_at
@@ -1,4 +1,16 @@
+import atexit
+import copy
+import json
 import logging
+import queue
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+from conf.config import settings
+
+# set per request by RequestIdMiddleware, "-" outside of requests
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+
 
 def __get_log_level(log_level):
     match log_level:
@@ -16,18 +28,84 @@ def __get_log_level(log_level):
             raise ValueError(f"Invalid log level {log_level}")
 
 
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ContextQueueHandler(QueueHandler):
+    """Enqueues records for the listener thread, stream I/O never runs on the event loop."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # runs in the caller, where the request context is still set; the
+        # message is only rendered for records that passed the level check
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.request_id = request_id.get()
+        return record
+
+
+def __build_formatter(log_format: str) -> logging.Formatter:
+    if log_format == "json":
+        return JsonFormatter()
+    if log_format == "text":
+        return logging.Formatter(
+            "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+        )
+    raise ValueError(f"Invalid log format {log_format}")
+
+
+def __build_queue_handler() -> ContextQueueHandler:
+    records = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(__build_formatter(settings.LOG_FORMAT))
+    handler = ContextQueueHandler(records)
+    handler.listener = QueueListener(records, stream, respect_handler_level=True)
+    handler.listener.start()
+    atexit.register(stop_logging)
+    return handler
+
+
+__queue_handler: ContextQueueHandler | None = None
+
+
+def __get_queue_handler() -> ContextQueueHandler:
+    global __queue_handler
+    if __queue_handler is None:
+        __queue_handler = __build_queue_handler()
+    return __queue_handler
+
+
 def __build_logger(name: str, log_level: int):
-    ch = logging.StreamHandler()
-    ch.setLevel(log_level)
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    ch.setFormatter(formatter)
     logger = logging.getLogger(name)
     logger.setLevel(log_level)
-    logger.addHandler(ch)
+    handler = __get_queue_handler()
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+    logger.propagate = False
     return logger
 
 
-def build_logger(name: str, log_level: str):
-    return __build_logger(name, __get_log_level(log_level))
+def build_logger(name: str, log_level: str | None = None):
+    return __build_logger(name, __get_log_level(log_level or settings.LOG_LEVEL))
+
+
+def stop_logging():
+    """Write out the queued records, called on shutdown."""
+    if __queue_handler is not None and __queue_handler.listener is not None:
+        __queue_handler.listener.stop()
+        __queue_handler.listener = None
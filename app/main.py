@@ -1,17 +1,52 @@
+import os
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException
 from api.contacts import router as contacts_router
 from api.authentication import router as auth_router
 from api.users import router as users_router
-from errors import ContactNotFoundError
+from api.system import router as system_router
+from api.metrics import router as metrics_router
+from errors import (
+    ContactNotFoundError,
+    HashPoolSaturatedError,
+    AvatarTooLargeError,
+    RateLimitExceededError,
+    UserAlreadyExistsError,
+)
 
 from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from schemas import ErrorContent, ErrorsContent
-from slowapi.errors import RateLimitExceeded
 from fastapi.middleware.cors import CORSMiddleware
+from conf.config import settings
+from database.db import sessionmanager
+from services.hash import hash_pool
+from metrics.collectors import MULTIPROCESS
+from metrics.instrumentation import setup_metrics
+from logger.request_id import RequestIdMiddleware
+from body_limit import BodySizeLimitMiddleware, MULTIPART_OVERHEAD_BYTES
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # nothing heavy happens at import time, the engines are built here
+    sessionmanager.init()
+    if settings.SERVER_WARM_UP:
+        await sessionmanager.warm_up()
+    yield
+    # runs after uvicorn has drained in-flight requests
+    await sessionmanager.close()
+    hash_pool.shutdown()
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
 
-app = FastAPI(title="Contacts App")
+        multiprocess.mark_process_dead(os.getpid())
+
+
+app = FastAPI(title="Contacts App", lifespan=lifespan)
 
 origins = [
     "http://127.0.0.1:8000"
@@ -23,11 +58,38 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Next-Cursor",
+        "X-Total-Count",
+        "ETag",
+        "Server-Timing",
+        "X-Request-ID",
+    ],
+)
+app.add_middleware(RequestIdMiddleware)
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={"/api/users/avatar": settings.AVATAR_MAX_BYTES + MULTIPART_OVERHEAD_BYTES},
 )
 
 app.include_router(contacts_router, prefix="/api")
 app.include_router(auth_router, prefix="/api")
 app.include_router(users_router, prefix="/api")
+if settings.SYSTEM_ENDPOINTS_ENABLED:
+    app.include_router(system_router, prefix="/api")
+
+if settings.METRICS_ENABLED:
+    setup_metrics(app)
+    app.include_router(metrics_router)
+
+if settings.AVATAR_STORAGE == "local":
+    from fastapi.staticfiles import StaticFiles
+
+    app.mount(
+        settings.AVATAR_LOCAL_URL,
+        StaticFiles(directory=settings.AVATAR_LOCAL_DIR, check_dir=False),
+        name="avatars",
+    )
 
 @app.exception_handler(ContactNotFoundError)
 def item_not_found_error_handler(request: Request, exc: ContactNotFoundError):
@@ -38,6 +100,34 @@ def item_not_found_error_handler(request: Request, exc: ContactNotFoundError):
     )
 
 
+@app.exception_handler(UserAlreadyExistsError)
+def user_already_exists_error_handler(request: Request, exc: UserAlreadyExistsError):
+    error = ErrorContent(message=str(exc))
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content=ErrorsContent(errors=[error]).model_dump(),
+    )
+
+
+@app.exception_handler(HashPoolSaturatedError)
+def hash_pool_saturated_error_handler(request: Request, exc: HashPoolSaturatedError):
+    error = ErrorContent(message=str(exc))
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=ErrorsContent(errors=[error]).model_dump(),
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(AvatarTooLargeError)
+def avatar_too_large_error_handler(request: Request, exc: AvatarTooLargeError):
+    error = ErrorContent(message=str(exc))
+    return JSONResponse(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        content=ErrorsContent(errors=[error]).model_dump(),
+    )
+
+
 @app.exception_handler(ValueError)
 def item_not_found_error_handler(request: Request, exc: ValueError):
     error = ErrorContent(message=str(exc))
@@ -77,16 +167,27 @@ def item_not_found_error_handler(request: Request, exc: Exception):
         content=ErrorsContent(errors=[error]).model_dump(),
     )
 
-@app.exception_handler(RateLimitExceeded)
-async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
-    error = ErrorContent(message=str(f"Request limit exceeded for {request.client.host}. Please try again later."))
+@app.exception_handler(RateLimitExceededError)
+async def rate_limit_handler(request: Request, exc: RateLimitExceededError):
+    error = ErrorContent(message=str(exc))
     return JSONResponse(
         status_code=status.HTTP_429_TOO_MANY_REQUESTS,
         content=ErrorsContent(errors=[error]).model_dump(),
+        headers={"Retry-After": str(max(int(exc.reset_at - time.time()), 1))},
     )
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        "main:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=settings.SERVER_WORKER_COUNT,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        timeout_keep_alive=settings.SERVER_KEEP_ALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+    )
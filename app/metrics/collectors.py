@@ -0,0 +1,129 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+
+# set PROMETHEUS_MULTIPROC_DIR to aggregate counters and histograms of all server workers
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_RESPONSES = Counter(
+    "http_responses_total", "HTTP responses by status code", ["method", "route", "status"]
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries executed per HTTP request",
+    ["route"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Time spent in database queries per HTTP request",
+    ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds",
+    "Database query latency",
+    ["engine"],
+    buckets=LATENCY_BUCKETS,
+)
+HASH_WAIT_SECONDS = Histogram(
+    "password_hash_wait_seconds",
+    "Time bcrypt calls wait for a hash pool worker",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+HASH_RUN_SECONDS = Histogram(
+    "password_hash_run_seconds",
+    "Time bcrypt calls run in the hash pool",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+HASH_REJECTED = Counter(
+    "password_hash_rejected_total", "bcrypt calls rejected by a saturated hash pool"
+)
+AVATAR_UPLOAD_SECONDS = Histogram(
+    "avatar_upload_duration_seconds",
+    "Avatar upload latency by stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+EMAIL_SEND_SECONDS = Histogram(
+    "email_send_duration_seconds",
+    "SMTP send latency in the email worker",
+    ["result"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - started)
+
+
+class GaugeCollector:
+    """Reads gauges from a callback at scrape time, e.g. connection pool usage."""
+
+    def __init__(self, name: str, documentation: str, labels: list[str], read):
+        self.__name = name
+        self.__documentation = documentation
+        self.__labels = labels
+        self.__read = read
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    def collect(self):
+        gauge = GaugeMetricFamily(self.__name, self.__documentation, labels=self.__labels)
+        for label_values, value in self.__read():
+            gauge.add_metric(label_values, value)
+        yield gauge
+
+
+GAUGE_COLLECTORS: list[GaugeCollector] = []
+
+
+def register_gauge(name: str, documentation: str, labels: list[str], read) -> None:
+    # `python main.py` imports main a second time when uvicorn loads "main:app"
+    if any(collector.name == name for collector in GAUGE_COLLECTORS):
+        return
+    collector = GaugeCollector(name, documentation, labels, read)
+    GAUGE_COLLECTORS.append(collector)
+    REGISTRY.register(collector)
+
+
+def render_latest() -> tuple[bytes, str]:
+    registry = REGISTRY
+    if MULTIPROCESS:
+        # callback gauges are per process and cannot be aggregated, only the
+        # worker serving the scrape reports them
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in GAUGE_COLLECTORS:
+            registry.register(collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,150 @@
+import time
+from contextvars import ContextVar
+
+from fastapi import FastAPI
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from cache.contacts import contact_query_cache
+from database.db import sessionmanager
+from metrics.collectors import (
+    DB_QUERY_SECONDS,
+    HTTP_REQUEST_DB_QUERIES,
+    HTTP_REQUEST_DB_SECONDS,
+    HTTP_REQUEST_SECONDS,
+    HTTP_RESPONSES,
+    register_gauge,
+)
+from services.hash import hash_pool
+
+
+class RequestDbStats:
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# shared with the SQLAlchemy hooks, which run in the request's context
+request_db_stats: ContextVar[RequestDbStats | None] = ContextVar(
+    "request_db_stats", default=None
+)
+
+
+class MetricsMiddleware:
+    """Records latency, status and database usage per route and reports them in Server-Timing."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestDbStats()
+        token = request_db_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = (time.perf_counter() - started) * 1000
+                MutableHeaders(scope=message).append(
+                    "Server-Timing",
+                    f'db;desc="{stats.queries} queries";dur={stats.seconds * 1000:.1f}, '
+                    f"app;dur={elapsed:.1f}",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_db_stats.reset(token)
+            # route templates keep the label cardinality bounded
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            HTTP_REQUEST_SECONDS.labels(method=method, route=path).observe(
+                time.perf_counter() - started
+            )
+            HTTP_RESPONSES.labels(method=method, route=path, status=status_code).inc()
+            HTTP_REQUEST_DB_QUERIES.labels(route=path).observe(stats.queries)
+            HTTP_REQUEST_DB_SECONDS.labels(route=path).observe(stats.seconds)
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    histogram = DB_QUERY_SECONDS.labels(engine=name)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+        histogram.observe(elapsed)
+        stats = request_db_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started_at"):
+            conn.info["query_started_at"].pop()
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", handle_error)
+
+
+def pool_connections():
+    for status in sessionmanager.pool_status():
+        yield [status.engine, "checked_in"], status.checked_in
+        yield [status.engine, "checked_out"], status.checked_out
+        yield [status.engine, "overflow"], status.overflow
+
+
+def pool_waits():
+    for status in sessionmanager.pool_status():
+        yield [status.engine, "checkouts"], status.checkouts
+        yield [status.engine, "count"], status.wait_count
+        yield [status.engine, "seconds_total"], status.wait_seconds_total
+        yield [status.engine, "timeouts"], status.timeouts
+
+
+def hash_pool_pending():
+    yield [], hash_pool.pending
+
+
+def contact_cache_lookups():
+    status = contact_query_cache.status()
+    yield ["hit"], status.hits
+    yield ["miss"], status.misses
+
+
+def setup_metrics(app: FastAPI) -> None:
+    app.add_middleware(MetricsMiddleware)
+    sessionmanager.on_engine_created(instrument_engine)
+    register_gauge(
+        "db_pool_connections",
+        "Connections in the pool by state",
+        ["engine", "state"],
+        pool_connections,
+    )
+    register_gauge(
+        "db_pool_waits",
+        "Connection checkouts, the ones that waited, time spent waiting and timeouts",
+        ["engine", "stat"],
+        pool_waits,
+    )
+    register_gauge(
+        "password_hash_pending", "bcrypt calls running or queued", [], hash_pool_pending
+    )
+    register_gauge(
+        "contacts_cache_lookups",
+        "Contact search cache lookups since start",
+        ["result"],
+        contact_cache_lookups,
+    )
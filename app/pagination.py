@@ -0,0 +1,23 @@
+import base64
+import json
+
+from schemas import ContactsCursor, ContactRow
+
+
+def encode_cursor(sort: str, contact: ContactRow) -> str:
+    position = ContactsCursor(sort=sort, id=contact["id"])
+    if sort == "last_name":
+        position.last_name = contact["last_name"]
+    raw = position.model_dump_json(exclude_none=True).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> ContactsCursor:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = ContactsCursor.model_validate(json.loads(raw))
+    except ValueError:
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    if position.sort != sort or (sort == "last_name" and position.last_name is None):
+        raise ValueError(f"Cursor '{cursor}' does not match sort '{sort}'")
+    return position
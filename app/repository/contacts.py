@@ -1,58 +1,341 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from repository.models import Contact
-from typing import List
+from repository.models import Contact, User
+from typing import List, AsyncIterator
 from schemas import ContactsQuery
-from sqlalchemy import select, func
+from sqlalchemy import (
+    select,
+    func,
+    or_,
+    case,
+    tuple_,
+    insert,
+    update,
+    delete,
+    any_,
+    literal,
+    Integer,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import Row
+from pagination import decode_cursor
+import calendar
+import datetime
+
+YEAR_START_MD = 101
+YEAR_END_MD = 1231
+FEB_29_MD = 229
+MAR_1_MD = 301
+
+
+def birthday_md(date: datetime.date) -> int:
+    return date.month * 100 + date.day
+
+
+def upcoming_birthday_ranges(start: datetime.date, days: int) -> List[tuple[int, int]]:
+    """Inclusive (month * 100 + day) ranges covering birthdays in [start, start + days].
+
+    A window crossing New Year is split into two ranges. In non-leap years
+    February 29 birthdays are celebrated on March 1.
+    """
+    if days >= 365:
+        return [(YEAR_START_MD, YEAR_END_MD)]
+    end = start + datetime.timedelta(days=days)
+    lo, hi = birthday_md(start), birthday_md(end)
+    if lo == MAR_1_MD and not calendar.isleap(start.year):
+        lo = FEB_29_MD
+    if end.year == start.year:
+        return [(lo, hi)]
+    return [(lo, YEAR_END_MD), (YEAR_START_MD, hi)]
 
 
 class ContactRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def get_list_by_query(self, query: ContactsQuery) -> List[Contact]:
-        dynamic_query = select(Contact)
+    async def get_list_by_query(self, query: ContactsQuery) -> List[Row]:
+        dynamic_query = self.__filter(
+            select(
+                Contact.first_name,
+                Contact.last_name,
+                Contact.email,
+                Contact.phone,
+                Contact.date,
+                Contact.notes,
+                Contact.id,
+            ),
+            query,
+        )
+        if query.birthdays_from and query.birthdays_days is not None:
+            ranges = upcoming_birthday_ranges(
+                query.birthdays_from, query.birthdays_days
+            )
+            first_md = ranges[0][0]
+            dynamic_query = dynamic_query.order_by(
+                case((Contact.birthday_md >= first_md, 0), else_=1),
+                Contact.birthday_md,
+                Contact.id,
+            )
+        elif query.sort == "last_name":
+            dynamic_query = dynamic_query.order_by(Contact.last_name, Contact.id)
+        else:
+            dynamic_query = dynamic_query.order_by(Contact.id)
+        if query.cursor:
+            position = decode_cursor(query.cursor, query.sort)
+            if query.sort == "last_name":
+                dynamic_query = dynamic_query.where(
+                    tuple_(Contact.last_name, Contact.id)
+                    > tuple_(position.last_name, position.id)
+                )
+            else:
+                dynamic_query = dynamic_query.where(Contact.id > position.id)
+        elif query.skip:
+            dynamic_query = dynamic_query.offset(query.skip)
+        if query.limit:
+            dynamic_query = dynamic_query.limit(query.limit)
+        contacts = await self.session.execute(dynamic_query)
+        return contacts.all()
+
+    async def count_by_query(self, query: ContactsQuery) -> int:
+        """Number of contacts matching the filters of `query`, ignoring paging."""
+        result = await self.session.execute(
+            self.__filter(select(func.count()).select_from(Contact), query)
+        )
+        return result.scalar_one()
+
+    async def get_stats(self, user_id: int) -> List[Row]:
+        """Total, per birthday month and per email domain counts in one grouped query.
+
+        Rows of the () grouping set have grouping == 3, of (month) 1 and of (domain) 2.
+        Contacts without an email are counted in the total but have no domain row.
+        """
+        month = (Contact.birthday_md // 100).label("month")
+        domain = func.lower(func.split_part(Contact.email, "@", 2)).label("domain")
+        result = await self.session.execute(
+            select(
+                func.grouping(month, domain).label("grouping"),
+                month,
+                domain,
+                func.count().label("count"),
+            )
+            .where(Contact.user_id == user_id)
+            .group_by(func.grouping_sets(tuple_(), tuple_(month), tuple_(domain)))
+            .having(or_(func.grouping(domain) == 1, domain.isnot(None)))
+        )
+        return result.all()
+
+    @classmethod
+    def __filter(cls, statement, query: ContactsQuery):
         if query.first_name:
-            dynamic_query = dynamic_query.where(
+            statement = statement.where(
                 func.upper(Contact.first_name) == query.first_name.upper()
             )
         if query.last_name:
-            dynamic_query = dynamic_query.where(
+            statement = statement.where(
                 func.upper(Contact.last_name) == query.last_name.upper()
             )
         if query.email:
-            dynamic_query = dynamic_query.where(
+            statement = statement.where(
                 func.upper(Contact.email) == query.email.upper()
             )
+        if query.q:
+            statement = statement.where(cls.__search_condition(query.q, query.search))
         if query.date_from:
-            dynamic_query = dynamic_query.where(Contact.date >= query.date_from)
+            statement = statement.where(Contact.date >= query.date_from)
         if query.date_to:
-            dynamic_query = dynamic_query.where(Contact.date <= query.date_to)
-        dynamic_query = dynamic_query.where(Contact.user_id == query.user_id)
-        if query.skip:
-            dynamic_query = dynamic_query.offset(query.skip)
-        if query.limit:
-            dynamic_query = dynamic_query.limit(query.limit)
-        contacts = await self.session.execute(dynamic_query)
-        return contacts.scalars().all()
+            statement = statement.where(Contact.date <= query.date_to)
+        statement = statement.where(Contact.user_id == query.user_id)
+        if query.birthdays_from and query.birthdays_days is not None:
+            ranges = upcoming_birthday_ranges(
+                query.birthdays_from, query.birthdays_days
+            )
+            statement = statement.where(
+                or_(*[Contact.birthday_md.between(lo, hi) for lo, hi in ranges])
+            )
+        return statement
+
+    @staticmethod
+    def __search_condition(q: str, search: str):
+        columns = (Contact.first_name, Contact.last_name, Contact.email)
+        if search == "fuzzy":
+            return or_(*[column.op("%")(q) for column in columns])
+        pattern = (
+            q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        )
+        return or_(*[column.ilike(pattern, escape="\\") for column in columns])
+
+    async def get_data_version(self, user_id: int) -> int:
+        result = await self.session.execute(
+            select(User.data_version).where(User.id == user_id)
+        )
+        return result.scalar_one()
+
+    async def __bump_data_version(self, user_id: int):
+        # runs in the same transaction as the contact change it accounts for
+        await self.session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(data_version=User.data_version + 1)
+        )
 
     async def get_by_id(self, id: int, user_id: int) -> Contact | None:
         stmt = select(Contact).filter_by(id=id, user_id=user_id)
         contact = await self.session.execute(stmt)
         return contact.scalar_one_or_none()
 
-    async def create(self, contact: Contact) -> Contact:
-        self.session.add(contact)
+    async def create(self, values: dict) -> Contact:
+        result = await self.session.execute(
+            insert(Contact).values(**values).returning(Contact)
+        )
+        contact = result.scalar_one()
+        await self.__bump_data_version(contact.user_id)
+        await self.session.commit()
+        return contact
+
+    async def create_many(
+        self, user_id: int, batches: AsyncIterator[List[dict]]
+    ) -> int:
+        created = 0
+        async for batch in batches:
+            result = await self.session.execute(
+                insert(Contact).values(batch).returning(Contact.id)
+            )
+            created += len(result.all())
+        if created:
+            await self.__bump_data_version(user_id)
         await self.session.commit()
-        await self.session.refresh(contact)
-        return await self.get_by_id(contact.id, contact.user_id)
+        return created
 
-    async def update(self, contact: Contact) -> Contact:
+    async def stream_by_user(
+        self, user_id: int, batch_size: int
+    ) -> AsyncIterator[Row]:
+        stmt = (
+            select(
+                Contact.id,
+                Contact.first_name,
+                Contact.last_name,
+                Contact.email,
+                Contact.phone,
+                Contact.date,
+                Contact.notes,
+            )
+            .where(Contact.user_id == user_id)
+            .order_by(Contact.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await self.session.stream(stmt)
+        async for row in result:
+            yield row
+
+    async def update(self, id: int, user_id: int, values: dict) -> Contact | None:
+        result = await self.session.execute(
+            update(Contact)
+            .where(Contact.id == id, Contact.user_id == user_id)
+            .values(**values)
+            .returning(Contact)
+        )
+        contact = result.scalar_one_or_none()
+        if contact is not None:
+            await self.__bump_data_version(user_id)
         await self.session.commit()
-        await self.session.refresh(contact)
-        return await self.get_by_id(contact.id, contact.user_id)
+        return contact
+
+    async def patch(self, id: int, user_id: int, values: dict) -> Contact | None:
+        """Update only the columns of `values` that differ from the stored row.
+
+        Nothing is written, and the data version is kept, when no column changes.
+        """
+        result = await self.session.execute(
+            select(Contact).filter_by(id=id, user_id=user_id).with_for_update()
+        )
+        contact = result.scalar_one_or_none()
+        if contact is None:
+            await self.session.rollback()
+            return None
+        changes = {
+            column: value
+            for column, value in values.items()
+            if getattr(contact, column) != value
+        }
+        if changes:
+            result = await self.session.execute(
+                update(Contact)
+                .where(Contact.id == id, Contact.user_id == user_id)
+                .values(**changes)
+                .returning(Contact)
+                .execution_options(populate_existing=True)
+            )
+            contact = result.scalar_one()
+            await self.__bump_data_version(user_id)
+        await self.session.commit()
+        return contact
+
+    async def update_many(
+        self,
+        user_id: int,
+        values: dict,
+        ids: List[int] | None = None,
+        query: ContactsQuery | None = None,
+    ) -> List[int]:
+        """Apply `values` to the user's contacts selected by `ids` or `query`.
+
+        One UPDATE ... RETURNING id; the transaction is left open so the caller
+        can roll it back when some of the requested ids were not changed.
+        """
+        statement = self.__batch_target(update(Contact), user_id, ids, query)
+        result = await self.session.execute(
+            statement.values(**values)
+            .returning(Contact.id)
+            .execution_options(synchronize_session=False)
+        )
+        changed = list(result.scalars())
+        if changed:
+            await self.__bump_data_version(user_id)
+        return changed
+
+    async def remove_many(
+        self,
+        user_id: int,
+        ids: List[int] | None = None,
+        query: ContactsQuery | None = None,
+    ) -> List[int]:
+        """Delete the user's contacts selected by `ids` or `query`, see `update_many`."""
+        statement = self.__batch_target(delete(Contact), user_id, ids, query)
+        result = await self.session.execute(
+            statement.returning(Contact.id).execution_options(
+                synchronize_session=False
+            )
+        )
+        removed = list(result.scalars())
+        if removed:
+            await self.__bump_data_version(user_id)
+        return removed
+
+    @classmethod
+    def __batch_target(
+        cls, statement, user_id: int, ids: List[int] | None, query: ContactsQuery | None
+    ):
+        if ids is not None:
+            # a single array parameter keeps the statement the same for any number of ids
+            return statement.where(
+                Contact.id == any_(literal(ids, ARRAY(Integer))), Contact.user_id == user_id
+            )
+        return cls.__filter(statement, query)
+
+    async def commit(self):
+        await self.session.commit()
+
+    async def rollback(self):
+        await self.session.rollback()
 
-    async def remove(self, contact: Contact) -> Contact:
-        await self.session.delete(contact)
+    async def remove(self, id: int, user_id: int) -> Contact | None:
+        result = await self.session.execute(
+            delete(Contact)
+            .where(Contact.id == id, Contact.user_id == user_id)
+            .returning(Contact)
+        )
+        contact = result.scalar_one_or_none()
+        if contact is not None:
+            await self.__bump_data_version(user_id)
         await self.session.commit()
         return contact
@@ -0,0 +1,76 @@
+import datetime
+from typing import List
+
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from repository.models import EmailOutbox
+
+
+class EmailOutboxRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def enqueue(self, message: EmailOutbox) -> EmailOutbox:
+        """Adds the message to the caller's transaction, it is sent once that commits."""
+        self.session.add(message)
+        return message
+
+    async def claim_batch(self, limit: int, lease: float) -> List[EmailOutbox]:
+        """Leases due messages to the caller for `lease` seconds and commits.
+
+        Rows locked by other workers are skipped. A message still sending once
+        its lease has run out, because its worker died, is due again.
+        """
+        due = (
+            select(EmailOutbox.id)
+            .where(
+                EmailOutbox.status.in_(("pending", "sending")),
+                EmailOutbox.next_attempt_at <= func.now(),
+            )
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = await self.session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(due))
+            .values(
+                status="sending",
+                next_attempt_at=func.now() + datetime.timedelta(seconds=lease),
+            )
+            .returning(EmailOutbox)
+            .execution_options(synchronize_session=False)
+        )
+        batch = result.scalars().all()
+        await self.session.commit()
+        return batch
+
+    async def mark_sent(self, message: EmailOutbox) -> None:
+        await self.session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id == message.id, EmailOutbox.status == "sending")
+            .values(status="sent", sent_at=func.now(), last_error=None)
+        )
+        await self.session.commit()
+
+    async def mark_failed(
+        self, message: EmailOutbox, error: str, retry_in: float | None
+    ) -> None:
+        values = {"attempts": EmailOutbox.attempts + 1, "last_error": error}
+        if retry_in is None:
+            values["status"] = "failed"
+        else:
+            values["status"] = "pending"
+            values["next_attempt_at"] = func.now() + datetime.timedelta(
+                seconds=retry_in
+            )
+        await self.session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id == message.id, EmailOutbox.status == "sending")
+            .values(**values)
+        )
+        await self.session.commit()
+
+    async def commit(self) -> None:
+        await self.session.commit()
@@ -1,4 +1,17 @@
-from sqlalchemy import Integer, String, Date, DateTime, func, ForeignKey, Boolean
+from sqlalchemy import (
+    Integer,
+    String,
+    Date,
+    DateTime,
+    func,
+    ForeignKey,
+    Boolean,
+    Computed,
+    Index,
+    JSON,
+    BigInteger,
+    text,
+)
 import datetime
 
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
@@ -14,10 +27,62 @@ class Contact(Base):
     email: Mapped[str] = mapped_column(String, nullable=True)
     phone: Mapped[str] = mapped_column(String, nullable=True)
     date: Mapped[datetime.date] = mapped_column(Date, nullable=False)
+    # month * 100 + day of the birthday, e.g. 1231 for December 31
+    birthday_md: Mapped[int] = mapped_column(
+        Integer,
+        Computed(
+            'CAST(EXTRACT(MONTH FROM "date") * 100 + EXTRACT(DAY FROM "date") AS INTEGER)',
+            persisted=True,
+        ),
+    )
     notes: Mapped[str] = mapped_column(String, nullable=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), nullable=False) 
     user: Mapped["User"] = relationship("User", backref="contacts")
 
+    __table_args__ = (
+        Index("ix_contacts_user_id_birthday_md", "user_id", "birthday_md"),
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+        Index("ix_contacts_user_id_last_name_id", "user_id", "last_name", "id"),
+    )
+
+Index(
+    "ix_contacts_user_id_upper_first_name",
+    Contact.user_id,
+    func.upper(Contact.first_name),
+)
+Index(
+    "ix_contacts_user_id_upper_last_name",
+    Contact.user_id,
+    func.upper(Contact.last_name),
+)
+Index(
+    "ix_contacts_user_id_upper_email",
+    Contact.user_id,
+    func.upper(Contact.email),
+)
+# trigram indexes serve q= prefix (ILIKE) and fuzzy (%) searches; they are not
+# scoped by user_id, every search also filters by user_id and the planner
+# combines both indexes with a BitmapAnd
+Index(
+    "ix_contacts_first_name_trgm",
+    Contact.first_name,
+    postgresql_using="gin",
+    postgresql_ops={"first_name": "gin_trgm_ops"},
+)
+Index(
+    "ix_contacts_last_name_trgm",
+    Contact.last_name,
+    postgresql_using="gin",
+    postgresql_ops={"last_name": "gin_trgm_ops"},
+)
+Index(
+    "ix_contacts_email_trgm",
+    Contact.email,
+    postgresql_using="gin",
+    postgresql_ops={"email": "gin_trgm_ops"},
+)
+
+
 class User(Base):
     __tablename__ = "users"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -26,4 +91,55 @@ class User(Base):
     hashed_password: Mapped[str] = mapped_column(String)
     created_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=func.now())
     avatar: Mapped[str | None] = mapped_column(String(255), nullable=True)
-    confirmed: Mapped[bool] = mapped_column(Boolean, default=False)
\ No newline at end of file
+    confirmed: Mapped[bool] = mapped_column(Boolean, default=False)
+    # bumped with every change of the user's contacts or profile, drives the ETags
+    data_version: Mapped[int] = mapped_column(
+        BigInteger, default=0, server_default="0", nullable=False
+    )
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # sha256 of the opaque token handed to the client
+    token_hash: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, default=func.now(), nullable=False
+    )
+    expires_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+    # set once the token is rotated or revoked, a later use means it was leaked
+    revoked_at: Mapped[datetime.datetime | None] = mapped_column(
+        DateTime, nullable=True
+    )
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    recipient: Mapped[str] = mapped_column(String, nullable=False)
+    subject: Mapped[str] = mapped_column(String, nullable=False)
+    template_name: Mapped[str] = mapped_column(String, nullable=False)
+    template_body: Mapped[dict] = mapped_column(JSON, nullable=False)
+    # pending -> sending (leased to a worker until next_attempt_at) -> sent,
+    # back to pending for a retry, or failed once the attempts are exhausted
+    status: Mapped[str] = mapped_column(String(16), default="pending", nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_attempt_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, default=func.now(), nullable=False
+    )
+    last_error: Mapped[str | None] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, default=func.now(), nullable=False
+    )
+    sent_at: Mapped[datetime.datetime | None] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_email_outbox_due_next_attempt_at",
+            "next_attempt_at",
+            postgresql_where=text("status IN ('pending', 'sending')"),
+        ),
+    )
@@ -0,0 +1,83 @@
+from datetime import timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, insert, update, delete
+from repository.models import RefreshToken
+
+
+class RefreshTokenRepository:
+    def __init__(self, session: AsyncSession):
+        self.db = session
+
+    async def create(self, user_id: int, token_hash: str, ttl: timedelta):
+        # expired tokens of the user are dropped on the way
+        await self.db.execute(
+            delete(RefreshToken).where(
+                RefreshToken.user_id == user_id, RefreshToken.expires_at < func.now()
+            )
+        )
+        await self.db.execute(
+            insert(RefreshToken).values(
+                user_id=user_id, token_hash=token_hash, expires_at=func.now() + ttl
+            )
+        )
+        await self.db.commit()
+
+    async def rotate(
+        self, token_hash: str, new_token_hash: str, ttl: timedelta
+    ) -> int | None:
+        """Swap a live token for a new one, returns the owner or None when the token is not live.
+
+        The conditional UPDATE makes a token usable once even under concurrent refreshes.
+        """
+        result = await self.db.execute(
+            update(RefreshToken)
+            .where(
+                RefreshToken.token_hash == token_hash,
+                RefreshToken.revoked_at.is_(None),
+                RefreshToken.expires_at > func.now(),
+            )
+            .values(revoked_at=func.now())
+            .returning(RefreshToken.user_id)
+        )
+        user_id = result.scalar_one_or_none()
+        if user_id is None:
+            await self.db.rollback()
+            return None
+        await self.db.execute(
+            insert(RefreshToken).values(
+                user_id=user_id, token_hash=new_token_hash, expires_at=func.now() + ttl
+            )
+        )
+        await self.db.commit()
+        return user_id
+
+    async def revoke(self, token_hash: str) -> None:
+        await self.db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.token_hash == token_hash, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=func.now())
+        )
+        await self.db.commit()
+
+    async def revoke_all_of_token_owner(self, token_hash: str) -> int:
+        """Revoke every live token of the user an already revoked token belongs to.
+
+        Nothing is revoked for an unknown token or one that merely expired unused.
+        """
+        owner = (
+            select(RefreshToken.user_id)
+            .where(
+                RefreshToken.token_hash == token_hash,
+                RefreshToken.revoked_at.is_not(None),
+            )
+            .scalar_subquery()
+        )
+        result = await self.db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.user_id == owner, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=func.now())
+            .returning(RefreshToken.id)
+        )
+        revoked = len(result.all())
+        await self.db.commit()
+        return revoked
@@ -1,13 +1,18 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func, or_
+from sqlalchemy.dialects.postgresql import insert
 from repository.models import User
-from sqlalchemy import select
 
 
 class UserRepository:
     def __init__(self, session: AsyncSession):
         self.db = session
 
+    async def get_user_by_id(self, id: int) -> User | None:
+        stmt = select(User).filter_by(id=id)
+        user = await self.db.execute(stmt)
+        return user.scalar_one_or_none()
+
     async def get_user_by_username(self, username: str) -> User | None:
         stmt = select(User).filter_by(username=username)
         user = await self.db.execute(stmt)
@@ -18,16 +23,39 @@ class UserRepository:
         user = await self.db.execute(stmt)
         return user.scalar_one_or_none()
 
-    async def create_user(self, user: User) -> User:
-        self.db.add(user)
-        await self.db.commit()
-        await self.db.refresh(user)
-        return user
+    async def create_user(self, values: dict) -> User | None:
+        """Insert the user unless the username or email is taken, in which case None is returned.
 
-    async def confirmed_email(self, email: str) -> None:
+        The insert is left uncommitted so rows that belong with it can join the transaction.
+        """
+        result = await self.db.execute(
+            insert(User).values(**values).on_conflict_do_nothing().returning(User)
+        )
+        return result.scalar_one_or_none()
+
+    async def find_conflict(self, username: str, email: str) -> str | None:
+        """Name of the unique field ("email" first, then "username") already in use."""
+        result = await self.db.execute(
+            select(
+                func.bool_or(User.email == email),
+                func.bool_or(User.username == username),
+            ).where(or_(User.email == email, User.username == username))
+        )
+        email_taken, username_taken = result.one()
+        if email_taken:
+            return "email"
+        if username_taken:
+            return "username"
+        return None
+
+    async def confirmed_email(self, email: str) -> User:
         user = await self.get_user_by_email(email)
         user.confirmed = True
         await self.db.commit()
+        return user
+
+    async def commit(self) -> None:
+        await self.db.commit()
 
     async def update(self, user: User) -> User:
         await self.db.commit()
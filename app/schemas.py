@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter, model_validator
 from datetime import date
-from typing import Optional, List
+from typing import Optional, List, Literal
+from typing_extensions import TypedDict
 
 
 class ContactBase(BaseModel):
@@ -22,17 +23,163 @@ class ContractModel(ContactBase):
     id: int = Field(description="Identifier")
 
 
+class ContactPatch(BaseModel):
+    """Sparse contact changes, fields left out of the body are kept as they are."""
+
+    first_name: Optional[str] = Field(
+        default=None, description="Contact first name", max_length=100
+    )
+    last_name: Optional[str] = Field(
+        default=None, description="Contact last name", max_length=100
+    )
+    email: Optional[str] = Field(
+        default=None,
+        max_length=50,
+        pattern=r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$",
+        description="Contact email",
+    )
+    phone: Optional[str] = Field(
+        default=None, max_length=30, description="Contact phone"
+    )
+    date: Optional[str] = Field(
+        default=None, pattern=r"^\d{4}-\d{2}-\d{2}$", description="Contact birthday"
+    )
+    notes: Optional[str] = Field(
+        default=None, max_length=255, description="Contact notes"
+    )
+
+    @model_validator(mode="after")
+    def check_required_not_null(self):
+        for field in self.model_fields_set - {"notes"}:
+            if getattr(self, field) is None:
+                raise ValueError(f"Field '{field}' can not be null")
+        return self
+
+
+class ContactRow(TypedDict):
+    """Contact read from the database, serialized as ContractModel without re-validation."""
+
+    first_name: str
+    last_name: str
+    # nullable columns
+    email: Optional[str]
+    phone: Optional[str]
+    date: date
+    notes: Optional[str]
+    id: int
+
+
+contact_rows_adapter = TypeAdapter(List[ContactRow])
+
+
+ContactsSort = Literal["id", "last_name"]
+ContactsSearch = Literal["prefix", "fuzzy"]
+
+
+class ContactsCursor(BaseModel):
+    sort: ContactsSort
+    id: int
+    last_name: Optional[str] = None
+
+
 class ContactsQuery(BaseModel):
     skip: int
     limit: int
     first_name: Optional[str] = None
     last_name: Optional[str] = None
     email: Optional[str] = None
+    q: Optional[str] = None
+    search: ContactsSearch = "prefix"
     date_from: Optional[date] = None
     date_to: Optional[date] = None
+    birthdays_from: Optional[date] = None
+    birthdays_days: Optional[int] = None
+    cursor: Optional[str] = None
+    sort: ContactsSort = "id"
     user_id: int
 
 
+CONTACTS_BATCH_MAX_IDS = 1000
+
+
+class ContactsFilter(BaseModel):
+    first_name: Optional[str] = Field(default=None, min_length=1)
+    last_name: Optional[str] = Field(default=None, min_length=1)
+    email: Optional[str] = Field(default=None, min_length=1)
+    q: Optional[str] = Field(default=None, min_length=1, max_length=100)
+    search: ContactsSearch = "prefix"
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+    @model_validator(mode="after")
+    def check_search(self):
+        if self.search == "fuzzy" and self.q is None:
+            raise ValueError("Fuzzy search needs 'q'")
+        return self
+
+
+class ContactsBatchDelete(BaseModel):
+    ids: Optional[List[int]] = Field(
+        default=None,
+        min_length=1,
+        max_length=CONTACTS_BATCH_MAX_IDS,
+        description="Contacts to change, all of them have to exist",
+    )
+    filter: Optional[ContactsFilter] = Field(
+        default=None, description="Change every contact matching the filter instead"
+    )
+
+    @model_validator(mode="after")
+    def check_target(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Exactly one of 'ids' or 'filter' is required")
+        # search only says how q is matched, it narrows nothing on its own
+        if self.filter is not None and not self.filter.model_dump(
+            exclude_none=True, exclude={"search"}
+        ):
+            raise ValueError("Filter needs at least one criterion")
+        return self
+
+
+class ContactsBatchUpdate(ContactsBatchDelete):
+    changes: ContactPatch
+
+    @model_validator(mode="after")
+    def check_changes(self):
+        if not self.changes.model_fields_set:
+            raise ValueError("Field 'changes' needs at least one field")
+        return self
+
+
+class ContactsBatchResult(BaseModel):
+    count: int = Field(description="Number of changed contacts")
+    ids: List[int] = Field(description="Identifiers of the changed contacts")
+
+
+class ContactsImportResult(BaseModel):
+    created: int = Field(description="Number of created contacts")
+
+
+class MonthCount(BaseModel):
+    month: int = Field(description="Birthday month, 1 to 12")
+    count: int
+
+
+class DomainCount(BaseModel):
+    domain: str = Field(description="Lower cased email domain")
+    count: int
+
+
+class ContactsStats(BaseModel):
+    total: int = Field(description="Number of contacts")
+    birthday_months: List[MonthCount] = Field(
+        description="Contacts per birthday month, months without birthdays are omitted"
+    )
+    email_domains: List[DomainCount] = Field(
+        description="Contacts per email domain, most common first"
+    )
+
+
 class ErrorContent(BaseModel):
     message: str
 
@@ -62,6 +209,10 @@ class UserModel(BaseModel):
 class TokenModel(BaseModel):
     token_type: str = "bearer"
     access_token: str
+    refresh_token: str | None = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str = Field(min_length=1, max_length=128)
 
 class ConfirmationResponse(BaseModel):
     message: str
@@ -71,4 +222,27 @@ class ConfirmationRequest(BaseModel):
         max_length=50,
         pattern=r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$",
         description="User email",
-    )
\ No newline at end of file
+    )
+
+
+class PoolStatus(BaseModel):
+    engine: str
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    checkouts: int
+    # checkouts that had to wait, see POOL_WAIT_THRESHOLD_SECONDS
+    wait_count: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+    timeouts: int
+
+
+class CacheStatus(BaseModel):
+    name: str
+    hits: int
+    misses: int
+    # only reported by in-process backends
+    entries: int | None = None
+    bytes: int | None = None
@@ -1,13 +1,16 @@
 from fastapi.security import OAuth2PasswordBearer
 from datetime import datetime, timedelta, UTC
 import time
+import uuid
 from typing import Optional
-from jose import JWTError, jwt
 from conf.config import settings
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, status, HTTPException
-from database.db import get_db
+from database.db import get_db, get_read_db
 from services.users import UserService
+from services.tokens import TokenClaims, token_verifier
+from cache.revocation import token_revocations
+from errors import InvalidTokenError, ExpiredTokenError
 from logger.logger import build_logger
 from schemas import UserModel
 
@@ -18,47 +21,78 @@ credentials_exception = HTTPException(
     detail="Unable to verify credentials",
     headers={"WWW-Authenticate": "Bearer"},
 )
-logger = build_logger("auth", "DEBUG")
+logger = build_logger("auth")
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     now = datetime.now(UTC)
-    expire = now + (expires_delta or timedelta(minutes=settings.JWT_EXPIRATION_SECONDS))
-    to_encode.update({"iat": now, "exp": expire})
-    return jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+    expire = now + (expires_delta or timedelta(seconds=settings.JWT_EXPIRATION_SECONDS))
+    # the jti lets a single token be revoked before it expires
+    to_encode.update({"iat": now, "exp": expire, "jti": uuid.uuid4().hex})
+    return token_verifier.encode(to_encode)
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
-) -> UserModel:
+async def revoke_access_token(claims: TokenClaims):
+    if claims.jti is not None:
+        await token_revocations.revoke(
+            claims.jti, claims.exp - time.time() + settings.JWT_LEEWAY_SECONDS
+        )
+
+
+async def get_token_claims(token: str = Depends(oauth2_scheme)) -> TokenClaims:
     try:
-        payload = jwt.decode(
-            token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
+        claims = token_verifier.verify(token)
+    except ExpiredTokenError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token is expired",
+            headers={"WWW-Authenticate": "Bearer"},
         )
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-
-        iat: int = payload.get("iat")
-        exp: int = payload.get("exp")
-        now = time.time()
-
-        if iat > now or now > exp:
-            HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Token is expired",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-
-    except JWTError:
+    except InvalidTokenError:
         raise credentials_exception
+    if claims.jti is not None and await token_revocations.is_revoked(claims.jti):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return claims
 
+
+async def get_current_user(
+    claims: TokenClaims = Depends(get_token_claims),
+    db: AsyncSession = Depends(get_db),
+) -> UserModel:
     service = UserService(logger, db)
-    user = await service.get_user_by_username(username)
+    user = await service.get_cached_user_by_username(claims.sub)
 
     if user is None:
         raise credentials_exception
 
     return user
 
+
+async def get_current_user_claims(
+    claims: TokenClaims = Depends(get_token_claims),
+    db: AsyncSession = Depends(get_read_db),
+) -> UserModel:
+    """The user as embedded in the token, looked up only for tokens without the claims.
+
+    The snapshot may lag behind the stored user (e.g. the avatar) until the
+    token is renewed, so use it where the user id and name are all that matter.
+    """
+    user = claims.to_user()
+    if user is not None:
+        return user
+    return await get_current_user(claims, db)
+
+
+async def get_admin_user(
+    current_user: UserModel = Depends(get_current_user),
+) -> UserModel:
+    if current_user.username not in settings.SYSTEM_ADMIN_USERNAMES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions"
+        )
+    return current_user
@@ -1,11 +1,30 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from repository.contacts import ContactRepository
-from schemas import ContactsQuery, ContractModel, ContactBase, UserModel
+from schemas import (
+    ContactsQuery,
+    ContactsStats,
+    ContractModel,
+    ContactBase,
+    ContactPatch,
+    ContactRow,
+    ContactsBatchDelete,
+    ContactsBatchResult,
+    ContactsBatchUpdate,
+    ContactsFilter,
+    DomainCount,
+    MonthCount,
+    UserModel,
+)
 from repository.models import Contact
 from logging import Logger
-from typing import List
+from typing import List, AsyncIterator, Literal
 from errors import ContactNotFoundError
 from datetime import datetime
+from conf.config import settings
+from services.contacts_io import CSV_FIELDS, to_csv_line, to_ndjson_line
+from cache.contacts import contact_query_cache
+
+EXPORT_LINES_PER_CHUNK = 500
 
 
 class ContactService:
@@ -13,69 +32,216 @@ class ContactService:
         self.__contact_repository: ContactRepository = ContactRepository(db)
         self.__logger: Logger = logger
 
-    async def get_by_query(self, query: ContactsQuery) -> List[ContractModel]:
-        self.__logger.debug(f"searching for contacts by '{query}'")
-        entities = await self.__contact_repository.get_list_by_query(query)
-        return list(
-            map(lambda c: self.__transform_contact_to_contract_model(c), entities)
+    async def get_by_query(
+        self, query: ContactsQuery, data_version: int | None = None
+    ) -> List[ContactRow]:
+        """Search contacts, results are cached when the user's data version is known."""
+        if data_version is not None:
+            contacts = await contact_query_cache.get(query, data_version)
+            if contacts is not None:
+                return contacts
+        self.__logger.debug("searching for contacts by '%s'", query)
+        rows = await self.__contact_repository.get_list_by_query(query)
+        contacts = [row._asdict() for row in rows]
+        if data_version is not None:
+            await contact_query_cache.set(query, data_version, contacts)
+        return contacts
+
+    async def count_by_query(
+        self, query: ContactsQuery, data_version: int | None = None
+    ) -> int:
+        # the total does not depend on the page, so all pages share one entry
+        query = query.model_copy(
+            update={"skip": 0, "limit": 0, "cursor": None, "sort": "id"}
         )
+        if data_version is not None:
+            total = await contact_query_cache.get_total(query, data_version)
+            if total is not None:
+                return total
+        total = await self.__contact_repository.count_by_query(query)
+        if data_version is not None:
+            await contact_query_cache.set_total(query, data_version, total)
+        return total
+
+    async def get_stats(
+        self, current_user: UserModel, data_version: int | None = None
+    ) -> ContactsStats:
+        if data_version is not None:
+            stats = await contact_query_cache.get_stats(current_user.id, data_version)
+            if stats is not None:
+                return stats
+        self.__logger.debug("computing contact stats for: '%s'", current_user.username)
+        total = 0
+        months, domains = [], []
+        for row in await self.__contact_repository.get_stats(current_user.id):
+            if row.grouping == 3:
+                total = row.count
+            elif row.grouping == 1:
+                months.append(MonthCount(month=row.month, count=row.count))
+            else:
+                domains.append(DomainCount(domain=row.domain, count=row.count))
+        stats = ContactsStats(
+            total=total,
+            birthday_months=sorted(months, key=lambda m: m.month),
+            email_domains=sorted(domains, key=lambda d: (-d.count, d.domain)),
+        )
+        if data_version is not None:
+            await contact_query_cache.set_stats(current_user.id, data_version, stats)
+        return stats
+
+    async def get_data_version(self, current_user: UserModel) -> int:
+        return await self.__contact_repository.get_data_version(current_user.id)
 
     async def create(self, contact: ContactBase, current_user: UserModel):
+        self.__logger.info("creating contact by: '%s'", current_user.username)
+        self.__logger.debug("contact content: '%s'", contact)
+        contact = await self.__contact_repository.create(
+            self.__to_values(contact, current_user.id)
+        )
+        return self.__transform_contact_to_contract_model(contact)
+
+    async def import_contacts(
+        self, contacts: AsyncIterator[ContactBase], current_user: UserModel
+    ) -> int:
+        self.__logger.info("importing contacts by: '%s'", current_user.username)
+        created = await self.__contact_repository.create_many(
+            current_user.id, self.__batches(contacts, current_user.id)
+        )
         self.__logger.info(
-            f"creating contact: '{contact}' by: '{current_user.username}'"
+            "imported %d contacts by: '%s'", created, current_user.username
         )
-        date = None
-        if contact.date:
-            date = datetime.strptime(contact.date, "%Y-%m-%d").date()
+        return created
 
-        entity = Contact(
-            first_name=contact.first_name,
-            last_name=contact.last_name,
-            email=contact.email,
-            phone=contact.phone,
-            date=date,
-            notes=contact.notes,
-            user_id=current_user.id,
+    async def export_contacts(
+        self, current_user: UserModel, format: Literal["ndjson", "csv"]
+    ) -> AsyncIterator[str]:
+        self.__logger.info(
+            "exporting contacts as %s by: '%s'", format, current_user.username
         )
+        lines = [to_csv_line(["id", *CSV_FIELDS])] if format == "csv" else []
+        async for row in self.__contact_repository.stream_by_user(
+            current_user.id, settings.CONTACTS_BULK_BATCH_SIZE
+        ):
+            if format == "csv":
+                lines.append(to_csv_line(list(row)))
+            else:
+                lines.append(to_ndjson_line(row._asdict()))
+            if len(lines) >= EXPORT_LINES_PER_CHUNK:
+                yield "".join(lines)
+                lines = []
+        if lines:
+            yield "".join(lines)
 
-        contact = await self.__contact_repository.create(entity)
-        return self.__transform_contact_to_contract_model(contact)
+    async def __batches(
+        self, contacts: AsyncIterator[ContactBase], user_id: int
+    ) -> AsyncIterator[List[dict]]:
+        batch = []
+        async for contact in contacts:
+            batch.append(self.__to_values(contact, user_id))
+            if len(batch) >= settings.CONTACTS_BULK_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
 
     async def update(self, id: int, contact: ContractModel, current_user: UserModel):
         self.__logger.info(
-            f"updating contact by id: '{id}' content: '{contact}' by: '{current_user.username}'"
+            "updating contact by id: '%s' by: '%s'", id, current_user.username
         )
+        self.__logger.debug("contact content: '%s'", contact)
         if id != contact.id:
             raise ValueError(
                 f"Id in request mismatch. Request: '{id}', body: '{contact.id}'"
             )
 
-        persisted = await self.__contact_repository.get_by_id(id, current_user.id)
+        persisted = await self.__contact_repository.update(
+            id, current_user.id, self.__to_values(contact, current_user.id)
+        )
         if not persisted:
             raise ContactNotFoundError(id)
-
-        for key, value in contact.__dict__.items():
-            if key == "date":
-                value = (
-                    datetime.strptime(contact.date, "%Y-%m-%d").date()
-                    if contact.date
-                    else None
-                )
-            setattr(persisted, key, value)
-
-        contact = await self.__contact_repository.update(persisted)
-        return self.__transform_contact_to_contract_model(contact)
+        return self.__transform_contact_to_contract_model(persisted)
 
     async def remove(self, id: int, current_user: UserModel) -> ContractModel:
         self.__logger.info(
-            f"remove contact by id: '{id}' by: '{current_user.username}'"
+            "remove contact by id: '%s' by: '%s'", id, current_user.username
+        )
+        persisted = await self.__contact_repository.remove(id, current_user.id)
+        if not persisted:
+            raise ContactNotFoundError(id)
+        return self.__transform_contact_to_contract_model(persisted)
+
+    async def patch(
+        self, id: int, contact: ContactPatch, current_user: UserModel
+    ) -> ContractModel:
+        self.__logger.info(
+            "patching contact by id: '%s' by: '%s'", id, current_user.username
+        )
+        self.__logger.debug("contact changes: '%s'", contact)
+        persisted = await self.__contact_repository.patch(
+            id, current_user.id, self.__to_patch_values(contact)
         )
-        persisted = await self.__contact_repository.get_by_id(id, current_user.id)
         if not persisted:
             raise ContactNotFoundError(id)
-        await self.__contact_repository.remove(persisted)
         return self.__transform_contact_to_contract_model(persisted)
 
+    async def update_many(
+        self, batch: ContactsBatchUpdate, current_user: UserModel
+    ) -> ContactsBatchResult:
+        self.__logger.info("batch updating contacts by: '%s'", current_user.username)
+        self.__logger.debug("batch content: '%s'", batch)
+        changed = await self.__contact_repository.update_many(
+            current_user.id,
+            self.__to_patch_values(batch.changes),
+            ids=batch.ids,
+            query=self.__to_query(batch.filter, current_user.id),
+        )
+        return await self.__finish_batch(batch.ids, changed)
+
+    async def remove_many(
+        self, batch: ContactsBatchDelete, current_user: UserModel
+    ) -> ContactsBatchResult:
+        self.__logger.info("batch removing contacts by: '%s'", current_user.username)
+        self.__logger.debug("batch content: '%s'", batch)
+        removed = await self.__contact_repository.remove_many(
+            current_user.id,
+            ids=batch.ids,
+            query=self.__to_query(batch.filter, current_user.id),
+        )
+        return await self.__finish_batch(batch.ids, removed)
+
+    async def __finish_batch(
+        self, ids: List[int] | None, affected: List[int]
+    ) -> ContactsBatchResult:
+        # an explicit id list is all or nothing: ids that are missing or
+        # belong to someone else undo the whole batch
+        if ids is not None:
+            missing = sorted(set(ids) - set(affected))
+            if missing:
+                await self.__contact_repository.rollback()
+                raise ContactNotFoundError(", ".join(map(str, missing)))
+        await self.__contact_repository.commit()
+        return ContactsBatchResult(count=len(affected), ids=sorted(affected))
+
+    def __to_query(
+        self, filter: ContactsFilter | None, user_id: int
+    ) -> ContactsQuery | None:
+        if filter is None:
+            return None
+        return ContactsQuery(skip=0, limit=0, user_id=user_id, **filter.model_dump())
+
+    def __to_patch_values(self, contact: ContactPatch) -> dict:
+        values = contact.model_dump(exclude_unset=True)
+        if "date" in values:
+            values["date"] = datetime.strptime(values["date"], "%Y-%m-%d").date()
+        return values
+
+    def __to_values(self, contact: ContactBase, user_id: int) -> dict:
+        return dict(
+            contact.model_dump(include=set(ContactBase.model_fields) - {"date"}),
+            date=datetime.strptime(contact.date, "%Y-%m-%d").date(),
+            user_id=user_id,
+        )
+
     def __transform_contact_to_contract_model(self, contact: Contact) -> ContractModel:
         return ContractModel(
             id=contact.id,
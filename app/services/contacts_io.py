@@ -0,0 +1,140 @@
+import codecs
+import csv
+import io
+import json
+from typing import AsyncIterator, Callable
+
+from pydantic import ValidationError
+
+from schemas import ContactBase
+
+CSV_FIELDS = ["first_name", "last_name", "email", "phone", "date", "notes"]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+    async for chunk in chunks:
+        tail += decoder.decode(chunk)
+        *lines, tail = tail.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail.rstrip("\r")
+
+
+async def parse_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[dict]:
+    async for line in lines:
+        if line.strip():
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("expected a JSON object")
+            yield record
+
+
+async def parse_csv(lines: AsyncIterator[str]) -> AsyncIterator[dict]:
+    header = None
+    record = ""
+    async for line in lines:
+        record = f"{record}\n{line}" if record else line
+        # a quoted field may span several lines
+        if record.count('"') % 2:
+            continue
+        if record.strip():
+            values = next(csv.reader(io.StringIO(record)))
+            if header is None:
+                header = [name.strip() for name in values]
+            else:
+                yield dict(zip(header, values))
+        record = ""
+    if record:
+        raise ValueError("Unterminated quoted field in CSV")
+
+
+async def parse_vcard(lines: AsyncIterator[str]) -> AsyncIterator[dict]:
+    card = None
+    previous = None
+    async for line in lines:
+        if line[:1] in (" ", "\t") and previous is not None:
+            # folded line continues the previous property value
+            previous = previous + line[1:]
+            continue
+        if previous is not None:
+            card = __apply_vcard_property(card, previous)
+            if card is not None and card.pop("__end__", False):
+                yield card
+                card = None
+        previous = line
+    if previous is not None:
+        card = __apply_vcard_property(card, previous)
+        if card is not None and card.pop("__end__", False):
+            yield card
+
+
+def __apply_vcard_property(card: dict | None, line: str) -> dict | None:
+    name, _, value = line.partition(":")
+    name = name.split(";")[0].upper()
+    match name:
+        case "BEGIN":
+            return {}
+        case "END" if card is not None:
+            card["__end__"] = True
+        case "N" if card is not None:
+            parts = value.split(";")
+            card.setdefault("last_name", parts[0])
+            if len(parts) > 1:
+                card.setdefault("first_name", parts[1])
+        case "FN" if card is not None and "first_name" not in card:
+            first, _, last = value.partition(" ")
+            card["first_name"] = first
+            card.setdefault("last_name", last)
+        case "EMAIL" if card is not None:
+            card.setdefault("email", value)
+        case "TEL" if card is not None:
+            card.setdefault("phone", value)
+        case "BDAY" if card is not None:
+            digits = value.replace("-", "")
+            card["date"] = f"{digits[:4]}-{digits[4:6]}-{digits[6:8]}"
+        case "NOTE" if card is not None:
+            card["notes"] = value.replace("\\n", "\n").replace("\\,", ",")
+    return card
+
+
+IMPORT_PARSERS: dict[str, Callable[[AsyncIterator[str]], AsyncIterator[dict]]] = {
+    "text/csv": parse_csv,
+    "application/x-ndjson": parse_ndjson,
+    "application/ndjson": parse_ndjson,
+    "application/jsonl": parse_ndjson,
+    "text/vcard": parse_vcard,
+    "text/x-vcard": parse_vcard,
+}
+
+
+async def parse_contacts(
+    content_type: str, chunks: AsyncIterator[bytes]
+) -> AsyncIterator[ContactBase]:
+    parser = IMPORT_PARSERS[content_type]
+    number = 0
+    try:
+        async for record in parser(iter_lines(chunks)):
+            number += 1
+            yield ContactBase.model_validate(
+                {key: value for key, value in record.items() if value not in ("", None)}
+            )
+    except ValidationError as e:
+        error = e.errors()[0]
+        field = ".".join(map(str, error["loc"]))
+        raise ValueError(f"Invalid contact #{number}: {error['msg']} '{field}'")
+    except ValueError as e:
+        raise ValueError(f"Invalid contact #{number + 1}: {e}")
+
+
+def to_ndjson_line(contact: dict) -> str:
+    return json.dumps(contact, default=str, ensure_ascii=False) + "\n"
+
+
+def to_csv_line(values: list) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(values)
+    return buffer.getvalue()
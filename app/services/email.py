@@ -1,53 +1,37 @@
-from pathlib import Path
-
-from fastapi import BackgroundTasks, HTTPException, status
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
+from fastapi import HTTPException, status
 from datetime import datetime, timedelta, UTC
-from jose import jwt, JWTError
 from logging import Logger
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from conf.config import settings
-
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.MAIL_USERNAME,
-    MAIL_PASSWORD=settings.MAIL_PASSWORD,
-    MAIL_FROM=settings.MAIL_FROM,
-    MAIL_PORT=settings.MAIL_PORT,
-    MAIL_SERVER=settings.MAIL_SERVER,
-    MAIL_FROM_NAME=settings.MAIL_FROM_NAME,
-    MAIL_STARTTLS=settings.MAIL_STARTTLS,
-    MAIL_SSL_TLS=settings.MAIL_SSL_TLS,
-    USE_CREDENTIALS=settings.USE_CREDENTIALS,
-    VALIDATE_CERTS=settings.VALIDATE_CERTS,
-    TEMPLATE_FOLDER=Path(__file__).parent.parent / "templates",
-)
+from repository.email_outbox import EmailOutboxRepository
+from repository.models import EmailOutbox
 
 
-def send_email(
-    background_tasks: BackgroundTasks, 
-    logger: Logger, 
+async def send_email(
+    db: AsyncSession,
+    logger: Logger,
     email: str, username: str, host: str
 ):
+    """Queues the confirmation email in the session's transaction, the caller commits it."""
     token_verification = create_email_token({"sub": email})
-    message = MessageSchema(
+    message = EmailOutbox(
+        recipient=email,
         subject="Confirm your email",
-        recipients=[email],
+        template_name="verify_email.html",
         template_body={
-            "host": host,
+            "host": str(host),
             "username": username,
             "token": token_verification,
         },
-        subtype=MessageType.html,
-    )
-
-    fm = FastMail(conf)
-    background_tasks.add_task(
-        fm.send_message, message, template_name="verify_email.html"
     )
-    logger.debug(f"Confirmation email for {email} has been placed to the queue")
+    await EmailOutboxRepository(db).enqueue(message)
+    logger.debug("Confirmation email for %s has been placed to the queue", email)
 
 
 def create_email_token(data: dict):
+    from jose import jwt
+
     to_encode = data.copy()
     expire = datetime.now(UTC) + timedelta(days=7)
     to_encode.update({"iat": datetime.now(UTC), "exp": expire})
@@ -55,6 +39,8 @@ def create_email_token(data: dict):
     return token
 
 def get_email_from_token(token: str):
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(
             token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
@@ -65,4 +51,4 @@ def get_email_from_token(token: str):
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail="Incorrect verification token",
-        )
\ No newline at end of file
+        )
@@ -1,11 +1,97 @@
-from passlib.context import CryptContext
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import cache
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from conf.config import settings
+from errors import HashPoolSaturatedError
+from metrics.collectors import HASH_REJECTED, HASH_RUN_SECONDS, HASH_WAIT_SECONDS
+
+@cache
+def get_pwd_context():
+    # passlib and its bcrypt backend load on the first hash, not at startup
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+
+def _timed_call(fn, *args):
+    started_at = time.monotonic()
+    return fn(*args), started_at
+
+
+class HashWorkerPool:
+    """Runs bcrypt off the event loop, rejecting work once `workers + max_queue` calls are pending."""
+
+    def __init__(self, kind: str, workers: int, max_queue: int):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Invalid hash pool kind {kind}")
+        self.__kind = kind
+        self.__workers = workers
+        self.__capacity = workers + max_queue
+        self.__executor: Executor | None = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+
+    async def run(self, fn, *args):
+        if self.pending >= self.__capacity:
+            self.rejected += 1
+            HASH_REJECTED.inc()
+            raise HashPoolSaturatedError()
+        self.pending += 1
+        submitted_at = time.monotonic()
+        try:
+            result, started_at = await asyncio.get_running_loop().run_in_executor(
+                self.__get_executor(), _timed_call, fn, *args
+            )
+        finally:
+            self.pending -= 1
+        finished_at = time.monotonic()
+        wait = max(started_at - submitted_at, 0.0)
+        self.completed += 1
+        self.wait_seconds_total += wait
+        self.wait_seconds_max = max(self.wait_seconds_max, wait)
+        self.run_seconds_total += finished_at - started_at
+        HASH_WAIT_SECONDS.labels(operation=fn.__name__).observe(wait)
+        HASH_RUN_SECONDS.labels(operation=fn.__name__).observe(finished_at - started_at)
+        return result
+
+    def shutdown(self):
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False, cancel_futures=True)
+            self.__executor = None
+
+    def __get_executor(self) -> Executor:
+        if self.__executor is None:
+            if self.__kind == "process":
+                self.__executor = ProcessPoolExecutor(max_workers=self.__workers)
+            else:
+                self.__executor = ThreadPoolExecutor(
+                    max_workers=self.__workers, thread_name_prefix="bcrypt"
+                )
+        return self.__executor
+
+
+hash_pool = HashWorkerPool(
+    settings.HASH_POOL_KIND, settings.HASH_POOL_WORKERS, settings.HASH_POOL_MAX_QUEUE
+)
+
+
+async def verify_password_async(plain_password, hashed_password):
+    return await hash_pool.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str):
+    return await hash_pool.run(get_password_hash, password)
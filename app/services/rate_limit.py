@@ -0,0 +1,61 @@
+from functools import cache, cached_property
+
+from fastapi import Request
+
+from conf.config import settings
+from errors import RateLimitExceededError, InvalidTokenError
+from services.tokens import token_verifier
+
+
+@cache
+def get_rate_limiter():
+    # limits and its storage clients load with the first limited request
+    from limits.storage import storage_from_string
+    from limits.aio.strategies import FixedWindowRateLimiter, MovingWindowRateLimiter
+
+    strategies = {
+        "moving-window": MovingWindowRateLimiter,
+        "fixed-window": FixedWindowRateLimiter,
+    }
+    url = settings.RATE_LIMIT_STORAGE_URL
+    if not url.startswith("async+"):
+        url = f"async+{url}"
+    return strategies[settings.RATE_LIMIT_STRATEGY](storage_from_string(url))
+
+
+def rate_limit_key(request: Request) -> str:
+    """Authenticated requests are limited per user (JWT `sub`), anonymous ones per client IP."""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        # shares the decode cache with authentication, expired tokens count per IP
+        try:
+            return f"user:{token_verifier.verify(token).sub}"
+        except InvalidTokenError:
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class RateLimit:
+    """Router dependency enforcing `limit` (e.g. "5/minute;100/hour") for a scope shared by all workers."""
+
+    def __init__(self, scope: str, limit: str):
+        self.scope = scope
+        self.limit = limit
+
+    @cached_property
+    def items(self) -> list:
+        if not self.limit:
+            return []
+        from limits import parse_many
+
+        return parse_many(self.limit)
+
+    async def __call__(self, request: Request):
+        if not self.items:
+            return
+        limiter = get_rate_limiter()
+        key = rate_limit_key(request)
+        for item in self.items:
+            if not await limiter.hit(item, self.scope, key):
+                stats = await limiter.get_window_stats(item, self.scope, key)
+                raise RateLimitExceededError(str(item), stats.reset_time)
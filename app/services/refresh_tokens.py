@@ -0,0 +1,57 @@
+import hashlib
+import secrets
+from datetime import timedelta
+from logging import Logger
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from conf.config import settings
+from errors import InvalidTokenError
+from repository.refresh_tokens import RefreshTokenRepository
+from schemas import UserModel
+from services.users import UserService
+
+
+def hash_refresh_token(token: str) -> str:
+    # tokens are random 256 bit values, a plain digest is enough to store them safely
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class RefreshTokenService:
+    def __init__(self, logger: Logger, db: AsyncSession):
+        self.__repository = RefreshTokenRepository(db)
+        self.__user_service = UserService(logger, db)
+        self.__logger = logger
+        self.__ttl = timedelta(seconds=settings.REFRESH_TOKEN_EXPIRATION_SECONDS)
+
+    async def issue(self, user: UserModel) -> str:
+        token = secrets.token_urlsafe(32)
+        await self.__repository.create(user.id, hash_refresh_token(token), self.__ttl)
+        return token
+
+    async def rotate(self, token: str) -> tuple[UserModel, str]:
+        """Exchange a refresh token for the user it belongs to and its successor.
+
+        Presenting an already rotated token revokes all tokens of its owner,
+        since either the client or an attacker holds a stolen copy. Expired
+        and unknown tokens are only rejected.
+        """
+        new_token = secrets.token_urlsafe(32)
+        token_hash = hash_refresh_token(token)
+        user_id = await self.__repository.rotate(
+            token_hash, hash_refresh_token(new_token), self.__ttl
+        )
+        if user_id is None:
+            revoked = await self.__repository.revoke_all_of_token_owner(token_hash)
+            if revoked:
+                self.__logger.warning(
+                    "refresh token reused, revoked %d tokens of its owner", revoked
+                )
+            raise InvalidTokenError("Refresh token is not valid")
+        user = await self.__user_service.get_user_by_id(user_id)
+        if user is None:
+            raise InvalidTokenError("Refresh token is not valid")
+        return user, new_token
+
+    async def revoke(self, token: str) -> None:
+        await self.__repository.revoke(hash_refresh_token(token))
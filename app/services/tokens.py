@@ -0,0 +1,160 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+from pydantic import BaseModel
+
+from conf.config import settings
+from errors import InvalidTokenError, ExpiredTokenError
+from schemas import UserModel
+
+
+class TokenClaims(BaseModel):
+    sub: str
+    iat: float
+    exp: float
+    nbf: float | None = None
+    jti: str | None = None
+    # minimal user snapshot, absent in tokens issued before it was embedded
+    uid: int | None = None
+    email: str | None = None
+    avatar: str | None = None
+
+    def to_user(self) -> UserModel | None:
+        if self.uid is None or self.email is None:
+            return None
+        return UserModel(
+            id=self.uid, username=self.sub, email=self.email, avatar=self.avatar
+        )
+
+
+def user_claims(user: UserModel) -> dict:
+    return {
+        "sub": user.username,
+        "uid": user.id,
+        "email": user.email,
+        "avatar": user.avatar,
+    }
+
+
+class JoseBackend:
+    def __init__(self):
+        from jose import jwt
+
+        self.__jwt = jwt
+
+    def encode(self, claims: dict) -> str:
+        return self.__jwt.encode(
+            claims, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM
+        )
+
+    def decode(self, token: str) -> dict:
+        from jose import JWTError
+
+        # time based claims are checked by TokenVerifier for cached tokens too
+        try:
+            return self.__jwt.decode(
+                token,
+                settings.JWT_SECRET,
+                algorithms=[settings.JWT_ALGORITHM],
+                options={"verify_exp": False, "verify_nbf": False, "verify_iat": False},
+            )
+        except JWTError as e:
+            raise InvalidTokenError(str(e)) from e
+
+
+class PyJWTBackend:
+    """PyJWT based backend, noticeably faster than python-jose for HMAC tokens."""
+
+    def __init__(self):
+        import jwt as pyjwt
+
+        self.__jwt = pyjwt
+
+    def encode(self, claims: dict) -> str:
+        return self.__jwt.encode(
+            claims, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM
+        )
+
+    def decode(self, token: str) -> dict:
+        try:
+            return self.__jwt.decode(
+                token,
+                settings.JWT_SECRET,
+                algorithms=[settings.JWT_ALGORITHM],
+                options={"verify_exp": False, "verify_nbf": False, "verify_iat": False},
+            )
+        except self.__jwt.PyJWTError as e:
+            raise InvalidTokenError(str(e)) from e
+
+
+JWT_BACKENDS = {"jose": JoseBackend, "pyjwt": PyJWTBackend}
+
+
+def build_jwt_backend(name: str):
+    if name not in JWT_BACKENDS:
+        raise ValueError(f"Unsupported JWT backend '{name}'")
+    return JWT_BACKENDS[name]()
+
+
+class TokenVerifier:
+    """Verifies access tokens, remembering successful decodes until the token expires.
+
+    Entries are keyed by the token hash so raw tokens are not kept in memory.
+    Time based claims are checked on every call, before any I/O. The JWT
+    backend is built, and its library imported, on first use.
+    """
+
+    def __init__(self, backend_name: str, max_size: int, leeway: float = 0):
+        self.__backend_name = backend_name
+        self.__backend = None
+        self.__max_size = max_size
+        self.__leeway = leeway
+        self.__decoded: OrderedDict[str, TokenClaims] = OrderedDict()
+
+    def encode(self, claims: dict) -> str:
+        return self.backend.encode(claims)
+
+    @property
+    def backend(self):
+        if self.__backend is None:
+            self.__backend = build_jwt_backend(self.__backend_name)
+        return self.__backend
+
+    def verify(self, token: str) -> TokenClaims:
+        key = hashlib.sha256(token.encode()).hexdigest()
+        claims = self.__decoded.get(key)
+        if claims is None:
+            try:
+                claims = TokenClaims.model_validate(self.backend.decode(token))
+            except ValueError as e:
+                raise InvalidTokenError(str(e)) from e
+            self.__remember(key, claims)
+        else:
+            self.__decoded.move_to_end(key)
+        now = time.time()
+        if now > claims.exp + self.__leeway:
+            self.__decoded.pop(key, None)
+            raise ExpiredTokenError("Token is expired")
+        if claims.iat > now + self.__leeway or (
+            claims.nbf is not None and claims.nbf > now + self.__leeway
+        ):
+            raise InvalidTokenError("Token is not yet valid")
+        return claims
+
+    def clear(self) -> None:
+        self.__decoded.clear()
+
+    def __remember(self, key: str, claims: TokenClaims) -> None:
+        if self.__max_size <= 0:
+            return
+        self.__decoded[key] = claims
+        while len(self.__decoded) > self.__max_size:
+            self.__decoded.popitem(last=False)
+
+
+token_verifier = TokenVerifier(
+    settings.JWT_BACKEND,
+    settings.TOKEN_CACHE_MAX_SIZE,
+    settings.JWT_LEEWAY_SECONDS,
+)
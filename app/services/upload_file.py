@@ -1,23 +1,119 @@
-import cloudinary
-import cloudinary.uploader
+import asyncio
+import hashlib
+import io
+import os
+import time
+from abc import ABC, abstractmethod
+from functools import cache
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
 
-class UploadFileService:
+from fastapi import UploadFile
+
+from conf.config import settings
+from errors import AvatarTooLargeError, InvalidAvatarError
+from metrics.collectors import AVATAR_UPLOAD_SECONDS, timed
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+class AvatarStorage(ABC):
+    @abstractmethod
+    def save(self, username: str, data: bytes) -> str:
+        """Stores a prepared PNG avatar and returns its public URL. Blocking."""
+
+
+class CloudinaryAvatarStorage(AvatarStorage):
     def __init__(self, cloud_name, api_key, api_secret):
-        self.cloud_name = cloud_name
-        self.api_key = api_key
-        self.api_secret = api_secret
+        import cloudinary
+
         cloudinary.config(
-            cloud_name=self.cloud_name,
-            api_key=self.api_key,
-            api_secret=self.api_secret,
+            cloud_name=cloud_name,
+            api_key=api_key,
+            api_secret=api_secret,
             secure=True,
         )
 
-    @staticmethod
-    def upload_file(file, username) -> str:
+    def save(self, username: str, data: bytes) -> str:
+        import cloudinary
+        import cloudinary.uploader
+
         public_id = f"ContactPoC/{username}"
-        r = cloudinary.uploader.upload(file.file, public_id=public_id, overwrite=True)
-        src_url = cloudinary.CloudinaryImage(public_id).build_url(
-            width=250, height=250, crop="fill", version=r.get("version")
+        r = cloudinary.uploader.upload(
+            io.BytesIO(data), public_id=public_id, overwrite=True
         )
-        return src_url
\ No newline at end of file
+        return cloudinary.CloudinaryImage(public_id).build_url(
+            version=r.get("version")
+        )
+
+
+class LocalAvatarStorage(AvatarStorage):
+    def __init__(self, directory: str, base_url: str):
+        self.__directory = Path(directory)
+        self.__base_url = base_url.rstrip("/")
+        self.__directory.mkdir(parents=True, exist_ok=True)
+
+    def save(self, username: str, data: bytes) -> str:
+        name = f"{hashlib.sha256(username.encode()).hexdigest()[:32]}.png"
+        tmp = self.__directory / f".{name}.{os.getpid()}.tmp"
+        tmp.write_bytes(data)
+        tmp.replace(self.__directory / name)
+        return f"{self.__base_url}/{name}?v={time.time_ns()}"
+
+
+@cache
+def get_avatar_storage() -> AvatarStorage:
+    match settings.AVATAR_STORAGE:
+        case "cloudinary":
+            return CloudinaryAvatarStorage(
+                settings.CLOUDINARY_NAME,
+                settings.CLOUDINARY_API_KEY,
+                settings.CLOUDINARY_API_SECRET,
+            )
+        case "local":
+            return LocalAvatarStorage(
+                settings.AVATAR_LOCAL_DIR, settings.AVATAR_LOCAL_URL
+            )
+        case _:
+            raise ValueError(f"Invalid avatar storage {settings.AVATAR_STORAGE}")
+
+
+class UploadFileService:
+    def __init__(self, storage: AvatarStorage, max_bytes: int, size: int):
+        self.storage = storage
+        self.max_bytes = max_bytes
+        self.size = size
+
+    async def upload_file(self, file: UploadFile, username: str) -> str:
+        with SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+            total = 0
+            with timed(AVATAR_UPLOAD_SECONDS, stage="receive"):
+                while chunk := await file.read(CHUNK_SIZE):
+                    total += len(chunk)
+                    if total > self.max_bytes:
+                        raise AvatarTooLargeError(self.max_bytes)
+                    spool.write(chunk)
+            spool.seek(0)
+            with timed(AVATAR_UPLOAD_SECONDS, stage="resize"):
+                data = await asyncio.to_thread(self.__prepare, spool)
+        with timed(AVATAR_UPLOAD_SECONDS, stage="store"):
+            return await asyncio.to_thread(self.storage.save, username, data)
+
+    def __prepare(self, source) -> bytes:
+        # Pillow is only needed here, keep it out of the startup imports
+        from PIL import Image, ImageOps
+
+        try:
+            with Image.open(source) as image:
+                image.load()
+                avatar = ImageOps.fit(
+                    ImageOps.exif_transpose(image), (self.size, self.size)
+                )
+        except (OSError, ValueError, Image.DecompressionBombError):
+            raise InvalidAvatarError()
+        if avatar.mode not in ("RGB", "RGBA"):
+            avatar = avatar.convert("RGBA")
+        output = io.BytesIO()
+        avatar.save(output, format="PNG", optimize=True)
+        return output.getvalue()
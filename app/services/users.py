@@ -4,52 +4,91 @@ from repository.users import UserRepository
 from schemas import UserCreate
 from repository.models import User
 from schemas import UserModel
-from services.hash import get_password_hash
+from services.hash import get_password_hash_async
+from services.email import send_email
 from logging import Logger
-import cloudinary
+from cache.users import user_cache
+from errors import UserAlreadyExistsError
 
 
 class UserService:
 
     def __init__(self, logger: Logger, db: AsyncSession):
+        self.__db = db
         self.__user_repository = UserRepository(db)
         self.__logger = logger
 
-    async def create_user(self, body: UserCreate) -> UserModel:
-        self.__logger.info(f"Creating user username: '{body.username}' email: '{body.email}'")
-        user = User(
-            **body.model_dump(exclude_unset=True, exclude={"password"}),
-            hashed_password=get_password_hash(body.password),
-            avatar=None
+    async def create_user(self, body: UserCreate, host: str) -> UserModel:
+        """Creates the user and queues its confirmation email in the same transaction."""
+        self.__logger.info("Creating user username: '%s' email: '%s'", body.username, body.email)
+        # an indexed lookup spares the bcrypt hash for most duplicate signups, the
+        # conflict-ignoring insert still settles concurrent ones
+        field = await self.__user_repository.find_conflict(body.username, body.email)
+        if field is not None:
+            raise UserAlreadyExistsError(field)
+        # end the read so no pooled connection is held while hashing
+        await self.__db.rollback()
+        found = await self.__user_repository.create_user(
+            dict(
+                body.model_dump(exclude_unset=True, exclude={"password"}),
+                hashed_password=await get_password_hash_async(body.password),
+                avatar=None,
+            )
         )
-        found = await self.__user_repository.create_user(user)
+        if found is None:
+            # the username or the email was taken, possibly by a concurrent registration
+            field = await self.__user_repository.find_conflict(body.username, body.email)
+            raise UserAlreadyExistsError(field or "username")
+        await send_email(self.__db, self.__logger, found.email, found.username, host)
+        await self.__user_repository.commit()
+        await user_cache.invalidate(found.username)
+        return self.__transform_user_model(found)
+
+    async def send_confirmation_email(self, user: User, host: str):
+        await send_email(self.__db, self.__logger, user.email, user.username, host)
+        await self.__user_repository.commit()
+
+    async def get_user_by_id(self, id: int) -> UserModel | None:
+        self.__logger.debug("Get user by id: '%s'", id)
+        found = await self.__user_repository.get_user_by_id(id)
         return self.__transform_user_model(found)
 
     async def get_user_by_username(self, username: str) -> UserModel | None:
         found = await self.get_user_entity_by_username(username)
         return self.__transform_user_model(found)
 
+    async def get_cached_user_by_username(self, username: str) -> UserModel | None:
+        user = await user_cache.get(username)
+        if user is None:
+            user = await self.get_user_by_username(username)
+            if user is not None:
+                await user_cache.set(user)
+        return user
+
     async def get_user_by_email(self, email: str) -> UserModel | None:
         found = await self.get_user_entity_by_email(email)
         return self.__transform_user_model(found)
     
     async def confirmed_email(self, email: str):
-        self.__logger.debug(f"Confirmating email: '{email}'")
-        await self.__user_repository.confirmed_email(email)
+        self.__logger.debug("Confirmating email: '%s'", email)
+        user = await self.__user_repository.confirmed_email(email)
+        await user_cache.invalidate(user.username)
     
     async def get_user_entity_by_username(self, username: str) -> User | None:
-        self.__logger.debug(f"Get user by username: '{username}'")
+        self.__logger.debug("Get user by username: '%s'", username)
         return await self.__user_repository.get_user_by_username(username)
     
     async def get_user_entity_by_email(self, email: str) -> User | None:
-        self.__logger.debug(f"Get user by email: '{email}'")
+        self.__logger.debug("Get user by email: '%s'", email)
         return await self.__user_repository.get_user_by_email(email)
     
     async def update_avatar_url(self, username: str, url: str):
-        self.__logger.debug(f"Update avatar for username: '{username}'")
+        self.__logger.debug("Update avatar for username: '%s'", username)
         found = await self.get_user_entity_by_username(username)
         found.avatar = url
+        found.data_version = User.data_version + 1
         await self.__user_repository.update(found)
+        await user_cache.invalidate(username)
         return self.__transform_user_model(found)
 
     def __transform_user_model(self, user: User) -> UserModel | None:
@@ -0,0 +1,150 @@
+import asyncio
+import signal
+import time
+from email.message import EmailMessage
+from email.utils import formataddr
+from functools import cache
+from logging import Logger
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
+from prometheus_client import start_http_server
+
+from conf.config import settings
+from database.db import DatabaseSessionManager, sessionmanager
+from logger.logger import build_logger
+from metrics.collectors import EMAIL_SEND_SECONDS
+from repository.email_outbox import EmailOutboxRepository
+from repository.models import EmailOutbox
+from workers.mail_transport import MailTransport, SMTPMailTransport
+
+TEMPLATE_FOLDER = Path(__file__).parent.parent / "templates"
+
+logger = build_logger("email_worker")
+
+
+@cache
+def get_template(name: str) -> Template:
+    environment = Environment(
+        loader=FileSystemLoader(TEMPLATE_FOLDER),
+        autoescape=select_autoescape(["html"]),
+    )
+    return environment.get_template(name)
+
+
+def build_message(outbox: EmailOutbox) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((settings.MAIL_FROM_NAME, settings.MAIL_FROM))
+    message["To"] = outbox.recipient
+    message["Subject"] = outbox.subject
+    message.set_content(
+        get_template(outbox.template_name).render(**outbox.template_body),
+        subtype="html",
+    )
+    return message
+
+
+def retry_delay(attempts: int) -> float | None:
+    """Exponential backoff after `attempts` failed sends, None once they are exhausted."""
+    if attempts >= settings.EMAIL_MAX_ATTEMPTS:
+        return None
+    return min(
+        settings.EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.EMAIL_RETRY_MAX_SECONDS,
+    )
+
+
+class EmailWorker:
+    def __init__(
+        self,
+        sessions: DatabaseSessionManager,
+        transport: MailTransport,
+        logger: Logger,
+    ):
+        self.__sessions = sessions
+        self.__transport = transport
+        self.__logger = logger
+
+    async def run_once(self) -> int:
+        # the claim is committed before sending, so no rows stay locked and no
+        # connection is held while the SMTP server is talked to
+        async with self.__sessions.session() as db:
+            repository = EmailOutboxRepository(db)
+            claimed_at = time.monotonic()
+            batch = await repository.claim_batch(
+                settings.EMAIL_WORKER_BATCH_SIZE, settings.EMAIL_SEND_LEASE_SECONDS
+            )
+            sent = 0
+            for outbox in batch:
+                if time.monotonic() - claimed_at > settings.EMAIL_SEND_LEASE_SECONDS:
+                    # the rest may already be claimed again by another worker
+                    self.__logger.warning("Email batch lease expired, leaving the rest")
+                    break
+                started = time.perf_counter()
+                try:
+                    await self.__transport.send(build_message(outbox))
+                except Exception as e:
+                    EMAIL_SEND_SECONDS.labels(result="failed").observe(
+                        time.perf_counter() - started
+                    )
+                    self.__logger.warning(
+                        "Sending email %s to %s failed: %s", outbox.id, outbox.recipient, e
+                    )
+                    await repository.mark_failed(
+                        outbox, str(e), retry_delay(outbox.attempts + 1)
+                    )
+                    continue
+                EMAIL_SEND_SECONDS.labels(result="sent").observe(
+                    time.perf_counter() - started
+                )
+                sent += 1
+                await repository.mark_sent(outbox)
+        if batch:
+            self.__logger.info("Sent %d of %d emails", sent, len(batch))
+        return len(batch)
+
+    async def run(self, stop: asyncio.Event) -> None:
+        try:
+            while not stop.is_set():
+                try:
+                    processed = await self.run_once()
+                except Exception as e:
+                    self.__logger.exception("Email batch failed: %s", e)
+                    processed = 0
+                if processed < settings.EMAIL_WORKER_BATCH_SIZE:
+                    try:
+                        await asyncio.wait_for(
+                            stop.wait(), settings.EMAIL_WORKER_POLL_SECONDS
+                        )
+                    except TimeoutError:
+                        pass
+        finally:
+            await self.__transport.close()
+
+
+def build_transport() -> MailTransport:
+    return SMTPMailTransport(
+        hostname=settings.MAIL_SERVER,
+        port=settings.MAIL_PORT,
+        username=settings.MAIL_USERNAME if settings.USE_CREDENTIALS else None,
+        password=settings.MAIL_PASSWORD if settings.USE_CREDENTIALS else None,
+        use_tls=settings.MAIL_SSL_TLS,
+        start_tls=settings.MAIL_STARTTLS,
+        validate_certs=settings.VALIDATE_CERTS,
+    )
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    if settings.EMAIL_WORKER_METRICS_PORT:
+        start_http_server(settings.EMAIL_WORKER_METRICS_PORT)
+    logger.info("Email worker started")
+    await EmailWorker(sessionmanager, build_transport(), logger).run(stop)
+    logger.info("Email worker stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,59 @@
+from abc import ABC, abstractmethod
+from email.message import EmailMessage
+
+import aiosmtplib
+
+
+class MailTransport(ABC):
+    @abstractmethod
+    async def send(self, message: EmailMessage) -> None: ...
+
+    @abstractmethod
+    async def close(self) -> None: ...
+
+
+class SMTPMailTransport(MailTransport):
+    """Keeps one SMTP connection open across messages and reconnects when the server drops it."""
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: str | None = None,
+        password: str | None = None,
+        use_tls: bool = False,
+        start_tls: bool = False,
+        validate_certs: bool = True,
+    ):
+        self.__username = username
+        self.__password = password
+        self.__smtp = aiosmtplib.SMTP(
+            hostname=hostname,
+            port=port,
+            use_tls=use_tls,
+            start_tls=start_tls,
+            validate_certs=validate_certs,
+        )
+
+    async def send(self, message: EmailMessage) -> None:
+        if not self.__smtp.is_connected:
+            await self.__connect()
+        try:
+            await self.__smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            await self.__connect()
+            await self.__smtp.send_message(message)
+
+    async def close(self) -> None:
+        if self.__smtp.is_connected:
+            try:
+                await self.__smtp.quit()
+            except aiosmtplib.SMTPException:
+                self.__smtp.close()
+
+    async def __connect(self) -> None:
+        if self.__smtp.is_connected:
+            self.__smtp.close()
+        await self.__smtp.connect()
+        if self.__username:
+            await self.__smtp.login(self.__username, self.__password)
@@ -0,0 +1,83 @@
+import asyncio
+import email
+import email.policy
+from email.message import EmailMessage
+
+from logger.logger import build_logger
+
+logger = build_logger("smtp_stub")
+
+
+class LocalSMTPServer:
+    """Minimal plain-text SMTP server that keeps received messages in memory.
+
+    Stands in for the real mail server in local runs and tests, the worker talks
+    to it through the regular SMTP transport with MAIL_SSL_TLS and
+    USE_CREDENTIALS disabled.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 1025):
+        self.host = host
+        self.port = port
+        self.messages: list[EmailMessage] = []
+        self.__server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        self.__server = await asyncio.start_server(
+            self.__handle, self.host, self.port
+        )
+        self.port = self.__server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self.__server is not None:
+            self.__server.close()
+            await self.__server.wait_closed()
+            self.__server = None
+
+    async def __handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def reply(line: str):
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        await reply("220 localhost ESMTP stub")
+        try:
+            while line := await reader.readline():
+                command = line.decode(errors="replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+                match verb:
+                    case "EHLO":
+                        await reply("250-localhost")
+                        await reply("250 8BITMIME")
+                    case "HELO" | "MAIL" | "RCPT" | "RSET" | "NOOP":
+                        await reply("250 OK")
+                    case "DATA":
+                        await reply("354 End data with <CR><LF>.<CR><LF>")
+                        data = bytearray()
+                        while (chunk := await reader.readline()) not in (b".\r\n", b""):
+                            data += chunk[1:] if chunk.startswith(b"..") else chunk
+                        message = email.message_from_bytes(
+                            bytes(data), policy=email.policy.default
+                        )
+                        self.messages.append(message)
+                        logger.info(
+                            "received '%s' for %s", message["Subject"], message["To"]
+                        )
+                        await reply("250 OK queued")
+                    case "QUIT":
+                        await reply("221 Bye")
+                        break
+                    case _:
+                        await reply("502 Command not implemented")
+        finally:
+            writer.close()
+
+
+async def main():
+    server = LocalSMTPServer()
+    await server.start()
+    logger.info("SMTP stub listening on %s:%s", server.host, server.port)
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
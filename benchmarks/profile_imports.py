@@ -0,0 +1,153 @@
+"""Import time profile of the application module graph.
+
+Imports `main` in a fresh interpreter with `python -X importtime` (several
+runs, the fastest is reported) and prints the total, the slowest modules by
+cumulative time and the app modules that pull them in. With `--startup` the
+app lifespan is run too, which is when the database engines are built.
+
+    poetry run python benchmarks/profile_imports.py
+    poetry run python benchmarks/profile_imports.py --top 40 --startup
+    poetry run python benchmarks/profile_imports.py --max-ms 1500
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+STARTUP = """
+import asyncio, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+async def run():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+asyncio.run(run())
+print("STARTUP", imported - started, time.perf_counter() - imported)
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main", help="module to import")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to try")
+    parser.add_argument("--top", type=int, default=25, help="slowest modules to list")
+    parser.add_argument(
+        "--startup",
+        action="store_true",
+        help="also run the app lifespan (connects to the configured database)",
+    )
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        help="exit with status 1 when importing takes longer than this",
+    )
+    parser.add_argument("--output", help="write the profile as JSON to this file")
+    return parser.parse_args()
+
+
+def profile(module: str) -> list[dict]:
+    env = dict(os.environ, LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            entries.append(
+                {
+                    "module": match.group(4),
+                    "self_ms": int(match.group(1)) / 1000,
+                    "cumulative_ms": int(match.group(2)) / 1000,
+                    "depth": len(match.group(3)) // 2,
+                }
+            )
+    return entries
+
+
+def importers(entries: list[dict]) -> dict[str, str]:
+    """Map every module to the first app module above it in the import tree."""
+    app_modules = {path.stem for path in APP_DIR.glob("*.py")} | {
+        path.name for path in APP_DIR.iterdir() if path.is_dir()
+    }
+    owners: dict[str, str] = {}
+    # -X importtime prints children before their parent
+    pending: list[dict] = []
+    for entry in entries:
+        children = []
+        while pending and pending[-1]["depth"] > entry["depth"]:
+            children.append(pending.pop())
+        if entry["module"].split(".")[0] in app_modules:
+            for child in children:
+                for module in child["subtree"]:
+                    owners.setdefault(module, entry["module"])
+        entry["subtree"] = [entry["module"]] + [
+            module for child in children for module in child["subtree"]
+        ]
+        pending.append(entry)
+    return owners
+
+
+def startup(module: str) -> tuple[float, float]:
+    result = subprocess.run(
+        [sys.executable, "-c", STARTUP.replace("import main", f"import {module}")],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    line = next(l for l in result.stdout.splitlines() if l.startswith("STARTUP"))
+    _, imported, lifespan = line.split()
+    return float(imported) * 1000, float(lifespan) * 1000
+
+
+def main(args) -> int:
+    runs = [profile(args.module) for _ in range(max(args.runs, 1))]
+    entries = min(runs, key=lambda run: run[-1]["cumulative_ms"])
+    total = entries[-1]["cumulative_ms"]
+    owners = importers(entries)
+    slowest = sorted(entries, key=lambda e: e["cumulative_ms"], reverse=True)
+
+    print(f"import {args.module}: {total:.1f} ms (fastest of {len(runs)})")
+    print(f"{'module':<50} {'cumulative':>10} {'self':>8}  imported by")
+    print("-" * 90)
+    for entry in slowest[1 : args.top + 1]:
+        print(
+            f"{entry['module']:<50} {entry['cumulative_ms']:>10.1f} "
+            f"{entry['self_ms']:>8.1f}  {owners.get(entry['module'], '')}"
+        )
+
+    results = {
+        "module": args.module,
+        "total_ms": total,
+        "modules": [
+            {key: entry[key] for key in ("module", "self_ms", "cumulative_ms")}
+            for entry in slowest
+        ],
+    }
+    if args.startup:
+        imported, lifespan = startup(args.module)
+        results["startup"] = {"import_ms": imported, "lifespan_ms": lifespan}
+        print(f"\nstartup: import {imported:.1f} ms, lifespan {lifespan:.1f} ms")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    if args.max_ms is not None and total > args.max_ms:
+        print(f"\nREGRESSION import takes {total:.1f} ms, budget is {args.max_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
@@ -0,0 +1,417 @@
+"""Benchmark of the API hot paths.
+
+Boots the FastAPI app in process (no network, no extra services besides the
+Postgres configured in .env, migrated with `alembic upgrade head`), seeds
+benchmark users and contacts, drives every scenario at a fixed concurrency
+and reports latency percentiles, throughput and database queries per request.
+
+    poetry run python benchmarks/run.py --users 20 --contacts 500 --concurrency 16
+    poetry run python benchmarks/run.py --output results.json
+    poetry run python benchmarks/run.py --baseline results.json --max-regression 0.25
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+SERVER_TIMING_DB = re.compile(r'db;desc="(\d+) queries";dur=([\d.]+)')
+SCENARIOS = (
+    "login",
+    "refresh",
+    "me",
+    "list",
+    "list_first_name",
+    "list_last_name",
+    "list_email",
+    "list_q_prefix",
+    "list_q_fuzzy",
+    "list_cursor",
+    "list_sort_last_name",
+    "birthdays",
+    "create",
+    "update",
+    "delete",
+)
+FIRST_NAMES = ("Anna", "Bohdan", "Daria", "Ivan", "Maria", "Oleh", "Sofia", "Taras")
+LAST_NAMES = ("Bondar", "Kovalenko", "Melnyk", "Shevchenko", "Tkachenko", "Koval")
+PASSWORD = "benchmark"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10, help="benchmark users to seed")
+    parser.add_argument(
+        "--contacts", type=int, default=200, help="contacts seeded per user"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=200, help="requests per scenario"
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help="comma separated subset of: " + ", ".join(SCENARIOS),
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--warm-cache",
+        action="store_true",
+        help="keep the user and contact caches (and CACHE_URL) on, by default "
+        "every read reaches Postgres",
+    )
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="results JSON to compare p95 latency with")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.2,
+        help="allowed relative p95 increase against the baseline",
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="do not delete the seeded data afterwards"
+    )
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    # must run before the app modules read their settings
+    for name in ("RATE_LIMIT_AUTH", "RATE_LIMIT_USERS", "RATE_LIMIT_CONTACTS"):
+        os.environ[name] = ""
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("SERVER_WARM_UP", "true")
+    if not args.warm_cache:
+        # the sizes only bound the in-process backend, a shared one would stay warm
+        os.environ["CACHE_URL"] = "memory://"
+        os.environ["USER_CACHE_MAX_SIZE"] = "0"
+        os.environ["CONTACTS_CACHE_MAX_SIZE"] = "0"
+    os.environ.setdefault("DB_POOL_SIZE", str(max(args.concurrency, 5)))
+    os.environ.setdefault("HASH_POOL_MAX_QUEUE", str(args.concurrency * 4))
+    sys.path.insert(0, str(APP_DIR))
+
+
+def percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(percent / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class Seed:
+    """Benchmark users with their tokens, and contact fixtures."""
+
+    def __init__(self, run_id: str, rnd: random.Random):
+        self.run_id = run_id
+        self.rnd = rnd
+        self.usernames: list[str] = []
+        self.user_ids: list[int] = []
+        self.tokens: list[str] = []
+        self.refresh_tokens: list[str] = []
+        self.refresh_locks: list[asyncio.Lock] = []
+        self.created: list[tuple[int, int]] = []
+
+    def contact(self, index: int) -> dict:
+        first_name = self.rnd.choice(FIRST_NAMES)
+        last_name = self.rnd.choice(LAST_NAMES)
+        birthday = datetime.date(1970, 1, 1) + datetime.timedelta(
+            days=self.rnd.randrange(365 * 40)
+        )
+        return {
+            "first_name": first_name,
+            "last_name": last_name,
+            "email": f"{first_name.lower()}.{last_name.lower()}{index}@example.com",
+            "phone": f"+380{self.rnd.randrange(10**9):09d}",
+            "date": birthday.isoformat(),
+            "notes": None,
+        }
+
+    async def create(self, users: int, contacts: int):
+        from sqlalchemy import insert
+
+        from database.db import sessionmanager
+        from repository.models import Contact, User
+        from services.hash import get_password_hash
+
+        hashed_password = get_password_hash(PASSWORD)
+        async with sessionmanager.session() as db:
+            for i in range(users):
+                username = f"bench_{self.run_id}_{i}"
+                result = await db.execute(
+                    insert(User)
+                    .values(
+                        username=username,
+                        email=f"{username}@bench.local",
+                        hashed_password=hashed_password,
+                        confirmed=True,
+                    )
+                    .returning(User.id)
+                )
+                user_id = result.scalar_one()
+                self.usernames.append(username)
+                self.user_ids.append(user_id)
+                rows = []
+                for j in range(contacts):
+                    row = self.contact(j)
+                    row["date"] = datetime.date.fromisoformat(row["date"])
+                    rows.append(dict(row, user_id=user_id))
+                for start in range(0, len(rows), 1000):
+                    await db.execute(insert(Contact).values(rows[start : start + 1000]))
+            await db.commit()
+
+    async def remove(self):
+        from sqlalchemy import delete
+
+        from database.db import sessionmanager
+        from repository.models import Contact, User
+
+        async with sessionmanager.session() as db:
+            await db.execute(delete(Contact).where(Contact.user_id.in_(self.user_ids)))
+            await db.execute(delete(User).where(User.id.in_(self.user_ids)))
+            await db.commit()
+
+
+class Runner:
+    def __init__(self, client, seed: Seed, concurrency: int):
+        self.client = client
+        self.seed = seed
+        self.concurrency = concurrency
+
+    def auth(self, user: int) -> dict:
+        return {"Authorization": f"Bearer {self.seed.tokens[user]}"}
+
+    async def login(self, user: int):
+        return await self.client.post(
+            "/api/auth/login",
+            data={"username": self.seed.usernames[user], "password": PASSWORD},
+        )
+
+    async def request(self, scenario: str, i: int):
+        seed = self.seed
+        user = i % len(seed.tokens)
+        headers = self.auth(user)
+        get = self.client.get
+        match scenario:
+            case "login":
+                return await self.login(user)
+            case "refresh":
+                # tokens rotate, so one refresh per user at a time
+                async with seed.refresh_locks[user]:
+                    response = await self.client.post(
+                        "/api/auth/refresh",
+                        json={"refresh_token": seed.refresh_tokens[user]},
+                    )
+                    if response.status_code == 200:
+                        seed.refresh_tokens[user] = response.json()["refresh_token"]
+                    return response
+            case "me":
+                return await get("/api/users/me", headers=headers)
+            case "list":
+                return await get("/api/contacts/", headers=headers, params={"skip": i % 50})
+            case "list_first_name":
+                params = {"first_name": seed.rnd.choice(FIRST_NAMES)}
+                return await get("/api/contacts/", headers=headers, params=params)
+            case "list_last_name":
+                params = {"last_name": seed.rnd.choice(LAST_NAMES)}
+                return await get("/api/contacts/", headers=headers, params=params)
+            case "list_email":
+                params = {"email": f"anna.melnyk{i % 100}@example.com"}
+                return await get("/api/contacts/", headers=headers, params=params)
+            case "list_q_prefix":
+                params = {"q": seed.rnd.choice(LAST_NAMES)[:3]}
+                return await get("/api/contacts/", headers=headers, params=params)
+            case "list_q_fuzzy":
+                params = {"q": seed.rnd.choice(LAST_NAMES)[:-1], "search": "fuzzy"}
+                return await get("/api/contacts/", headers=headers, params=params)
+            case "list_cursor":
+                first = await get("/api/contacts/", headers=headers, params={"limit": 50})
+                cursor = first.headers.get("X-Next-Cursor")
+                if cursor is None:
+                    return first
+                params = {"limit": 50, "cursor": cursor}
+                return await get("/api/contacts/", headers=headers, params=params)
+            case "list_sort_last_name":
+                params = {"sort": "last_name", "limit": 100}
+                return await get("/api/contacts/", headers=headers, params=params)
+            case "birthdays":
+                params = {"days": 30}
+                return await get("/api/contacts/birthdays", headers=headers, params=params)
+            case "create":
+                response = await self.client.post(
+                    "/api/contacts/", headers=headers, json=seed.contact(i)
+                )
+                if response.status_code == 201:
+                    seed.created.append((user, response.json()["id"]))
+                return response
+            case "update":
+                user, contact_id = seed.created[i % len(seed.created)]
+                body = dict(seed.contact(i), id=contact_id, notes=f"updated {i}")
+                return await self.client.put(
+                    f"/api/contacts/{contact_id}", headers=self.auth(user), json=body
+                )
+            case "delete":
+                if not seed.created:
+                    raise LookupError("no contacts left to delete, run create first")
+                user, contact_id = seed.created.pop()
+                return await self.client.delete(
+                    f"/api/contacts/{contact_id}", headers=self.auth(user)
+                )
+        raise ValueError(f"Unknown scenario {scenario}")
+
+    async def run(self, scenario: str, requests: int) -> dict:
+        latencies: list[float] = []
+        queries: list[int] = []
+        db_ms: list[float] = []
+        statuses: Counter = Counter()
+        errors: Counter = Counter()
+        counter = iter(range(requests))
+
+        async def worker():
+            for i in counter:
+                started = time.perf_counter()
+                try:
+                    response = await self.request(scenario, i)
+                except Exception as e:
+                    errors[type(e).__name__] += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[response.status_code] += 1
+                timing = SERVER_TIMING_DB.search(response.headers.get("Server-Timing", ""))
+                if timing:
+                    queries.append(int(timing.group(1)))
+                    db_ms.append(float(timing.group(2)))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        elapsed = time.perf_counter() - started
+        failed = sum(n for code, n in statuses.items() if code >= 400)
+        return {
+            "requests": requests,
+            "failed": failed + sum(errors.values()),
+            "statuses": {str(code): n for code, n in sorted(statuses.items())},
+            "errors": dict(errors),
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": {
+                "mean": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+                "p50": round(percentile(latencies, 50), 3),
+                "p95": round(percentile(latencies, 95), 3),
+                "p99": round(percentile(latencies, 99), 3),
+                "max": round(max(latencies, default=0.0), 3),
+            },
+            "db_queries_per_request": round(statistics.fmean(queries), 2)
+            if queries
+            else None,
+            "db_ms_per_request": round(statistics.fmean(db_ms), 3) if db_ms else None,
+        }
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    regressions = []
+    for scenario, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if not previous or not previous["latency_ms"]["p95"]:
+            continue
+        before, after = previous["latency_ms"]["p95"], current["latency_ms"]["p95"]
+        if after > before * (1 + max_regression):
+            regressions.append(
+                f"{scenario}: p95 {before:.1f} ms -> {after:.1f} ms "
+                f"(+{(after / before - 1) * 100:.0f}%)"
+            )
+        before_q = previous.get("db_queries_per_request")
+        after_q = current.get("db_queries_per_request")
+        if before_q is not None and after_q is not None and after_q > before_q:
+            regressions.append(
+                f"{scenario}: queries per request {before_q} -> {after_q}"
+            )
+    return regressions
+
+
+def print_table(results: dict):
+    header = f"{'scenario':<22}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'failed':>8}"
+    print(header)
+    print("-" * len(header))
+    for scenario, stats in results["scenarios"].items():
+        latency = stats["latency_ms"]
+        queries = stats["db_queries_per_request"]
+        print(
+            f"{scenario:<22}{stats['throughput_rps']:>9.1f}{latency['p50']:>9.1f}"
+            f"{latency['p95']:>9.1f}{latency['p99']:>9.1f}"
+            f"{queries if queries is not None else '-':>9}{stats['failed']:>8}"
+        )
+
+
+async def main(args) -> int:
+    import httpx
+
+    from main import app
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    seed = Seed(uuid.uuid4().hex[:8], random.Random(args.seed))
+    results = {
+        "started_at": datetime.datetime.now(datetime.UTC).isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "users": args.users,
+            "contacts_per_user": args.contacts,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warm_cache": args.warm_cache,
+            "seed": args.seed,
+        },
+        "scenarios": {},
+    }
+    async with app.router.lifespan_context(app):
+        await seed.create(args.users, args.contacts)
+        try:
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://benchmark"
+            ) as client:
+                runner = Runner(client, seed, args.concurrency)
+                for user in range(args.users):
+                    response = await runner.login(user)
+                    response.raise_for_status()
+                    seed.tokens.append(response.json()["access_token"])
+                    seed.refresh_tokens.append(response.json()["refresh_token"])
+                    seed.refresh_locks.append(asyncio.Lock())
+                if {"update", "delete"} & set(scenarios) and "create" not in scenarios:
+                    scenarios.insert(0, "create")
+                for scenario in scenarios:
+                    stats = await runner.run(scenario, args.requests)
+                    results["scenarios"][scenario] = stats
+        finally:
+            if not args.keep:
+                await seed.remove()
+
+    print_table(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(results, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    configure_environment(arguments)
+    sys.exit(asyncio.run(main(arguments)))
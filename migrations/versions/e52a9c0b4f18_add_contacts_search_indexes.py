@@ -0,0 +1,45 @@
+"""add contacts search indexes
+
+Revision ID: e52a9c0b4f18
+Revises: b3f08e5d17ac
+Create Date: 2026-10-18 19:05:23.774120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e52a9c0b4f18'
+down_revision: Union[str, None] = 'b3f08e5d17ac'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_COLUMNS = ("first_name", "last_name", "email")
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in SEARCH_COLUMNS:
+        op.create_index(
+            f"ix_contacts_user_id_upper_{column}",
+            "contacts",
+            ["user_id", sa.text(f"upper({column})")],
+            unique=False,
+        )
+        op.create_index(
+            f"ix_contacts_{column}_trgm",
+            "contacts",
+            [column],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    for column in SEARCH_COLUMNS:
+        op.drop_index(f"ix_contacts_{column}_trgm", table_name="contacts")
+        op.drop_index(f"ix_contacts_user_id_upper_{column}", table_name="contacts")
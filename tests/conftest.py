@@ -0,0 +1,21 @@
+import os
+import sys
+from pathlib import Path
+
+# app modules import each other relative to app/, as they do when the server runs
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+# required settings, nothing connects to these in the tests
+for name in (
+    "POSTGRES_USER",
+    "POSTGRES_PASSWORD",
+    "POSTGRES_HOST",
+    "POSTGRES_DB",
+    "MAIL_USERNAME",
+    "MAIL_PASSWORD",
+    "CLOUDINARY_NAME",
+    "CLOUDINARY_API_KEY",
+    "CLOUDINARY_API_SECRET",
+):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("MAIL_FROM", "test@example.com")
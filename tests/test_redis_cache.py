@@ -0,0 +1,120 @@
+import asyncio
+import logging
+
+import pytest
+
+import services.users
+from cache.backends import RedisCacheBackend
+from cache.fake_redis import FakeRedis
+from cache.revocation import RevocationLog, TokenRevocationList
+from cache.users import UserCache
+from repository.models import User
+from repository.users import UserRepository
+from schemas import UserModel
+from services.users import UserService
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
+
+
+@pytest.fixture
+def user_cache(redis, monkeypatch):
+    cache = UserCache(RedisCacheBackend(redis, "users", ttl=60))
+    monkeypatch.setattr(services.users, "user_cache", cache)
+    return cache
+
+
+def user(**values) -> User:
+    return User(
+        id=1,
+        username="anna",
+        email="anna@example.com",
+        avatar=None,
+        confirmed=False,
+        **values,
+    )
+
+
+async def test_values_expire_after_their_ttl(redis):
+    backend = RedisCacheBackend(redis, "users", ttl=0.05)
+    await backend.set("anna", "cached")
+    await backend.set("oleh", "cached", ttl=60)
+    assert await backend.get("anna") == "cached"
+
+    await asyncio.sleep(0.1)
+
+    assert await backend.get("anna") is None
+    assert await backend.get("oleh") == "cached"
+
+
+async def test_namespaces_do_not_share_keys(redis):
+    users = RedisCacheBackend(redis, "users")
+    contacts = RedisCacheBackend(redis, "contacts")
+    await users.set("1", "user")
+    await contacts.set("1", "contacts")
+
+    await users.delete("1")
+
+    assert await users.get("1") is None
+    assert await contacts.get("1") == "contacts"
+    assert await redis.get("contacts:1") == b"contacts"
+
+
+async def test_avatar_update_invalidates_the_cached_user(user_cache, monkeypatch):
+    stored = user()
+    await user_cache.set(UserModel.model_validate(stored))
+
+    async def get_user_by_username(self, username):
+        return stored
+
+    async def update(self, found):
+        return found
+
+    monkeypatch.setattr(UserRepository, "get_user_by_username", get_user_by_username)
+    monkeypatch.setattr(UserRepository, "update", update)
+    await UserService(logging.getLogger(), None).update_avatar_url(
+        "anna", "https://avatars/anna.png"
+    )
+
+    assert await user_cache.get("anna") is None
+
+
+async def test_email_confirmation_invalidates_the_cached_user(user_cache, monkeypatch):
+    stored = user()
+    await user_cache.set(UserModel.model_validate(stored))
+
+    async def confirmed_email(self, email):
+        stored.confirmed = True
+        return stored
+
+    monkeypatch.setattr(UserRepository, "confirmed_email", confirmed_email)
+    await UserService(logging.getLogger(), None).confirmed_email("anna@example.com")
+
+    assert await user_cache.get("anna") is None
+
+
+async def test_revocations_reach_other_workers_through_the_log(redis):
+    def worker() -> TokenRevocationList:
+        return TokenRevocationList(
+            RedisCacheBackend(redis, "revoked_tokens"),
+            RevocationLog(redis, "revoked_tokens::log", 3600),
+            capacity=100,
+            window=3600,
+            sync_interval=0,
+        )
+
+    first, second = worker(), worker()
+    await first.revoke("jti-1", ttl=60)
+
+    assert await first.is_revoked("jti-1")
+    assert await second.is_revoked("jti-1")
+    assert not await second.is_revoked("jti-2")